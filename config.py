@@ -19,11 +19,16 @@ class AppConfig:
     # バッチ処理サイズ
     BATCH_SIZE_ANALYZER: int = 20
     BATCH_SIZE_CLUSTERING: int = 32
+    MAX_BATCH_SIZE_CLUSTERING: int = 256  # GPUの空きメモリに応じて増やす場合の上限
+    CLUSTERING_BYTES_PER_IMAGE: int = 16 * 1024 * 1024  # 1枚あたりの推論時メモリの見積もり
     BATCH_SIZE_DELETE: int = 900
+    BATCH_SIZE_INSERT: int = 1000  # スキャン時に1トランザクションで登録する件数
     
     # サムネイル設定
     DEFAULT_THUMBNAIL_SIZE: int = 120
     THUMBNAIL_QUALITY: int = 70
+    PIXMAP_CACHE_LIMIT_KB: int = 64 * 1024  # QPixmapCacheの上限（KB）
+    THUMB_DISK_CACHE_LIMIT_MB: int = 512  # サムネイルのディスクキャッシュの上限（MB、起動時に古い順に削除）
     
     # 画像処理設定
     PHASH_SIZE: Tuple[int, int] = (9, 8)
@@ -46,6 +51,9 @@ class AppConfig:
     # データベース設定
     DB_NAME: str = "photos.db"
     DB_WAL_MODE: bool = True
+    DB_MMAP_SIZE: int = 256 * 1024 * 1024  # PRAGMA mmap_size（バイト）
+    DB_CACHE_SIZE_KB: int = 64 * 1024  # PRAGMA cache_size（KiB）
+    DB_VACUUM_THRESHOLD: int = 1024 * 1024 * 1024  # 初期化時、これを超えるDBのみVACUUMする（1GB）
     
     # ゴミ箱設定
     TRASH_FOLDER_NAME: str = "_TrashBox"
@@ -55,6 +63,10 @@ class AppConfig:
     SIDEBAR_WIDTH: int = 240
     GALLERY_ICON_SIZE: Tuple[int, int] = (180, 180)
     GALLERY_GRID_SIZE: Tuple[int, int] = (200, 200)
+    GALLERY_LAYOUT_BATCH_SIZE: int = 200  # ギャラリーのレイアウトを1回に処理する件数
+    
+    # 画像デコード用スレッド数（全ページ共通のQThreadPoolで共有）
+    DECODE_THREAD_COUNT: int = 4
     
     # プログレス更新間隔
     PROGRESS_UPDATE_INTERVAL_SCAN: int = 20
@@ -66,12 +78,20 @@ class AppConfig:
     
     # ピンボケ検出設定
     DEFAULT_BLUR_THRESHOLD: int = 20
+    BLUR_ANALYSIS_MAX_DIM: int = 1024  # ピンボケスコア計算前に縮小する長辺の最大値
     MAX_BLUR_THRESHOLD: int = 50
     
     # クラスタリング設定
     MAX_CLUSTERING_IMAGES: int = 10000  # 実用的な枚数に変更
     DBSCAN_EPS: float = 0.15
     DBSCAN_MIN_SAMPLES: int = 2
+    DBSCAN_ALGORITHM: str = "ball_tree"  # 近傍探索のアルゴリズム（"auto" / "ball_tree" / "kd_tree" / "brute"）
+    DBSCAN_LEAF_SIZE: int = 40  # ball_tree / kd_tree の葉のサイズ（大きいほど木は小さく、葉内の総当たりが増える）
+    DBSCAN_DENSE_THRESHOLD: int = 2000  # この枚数以下では距離行列全体を行列積で計算する（N×N×4バイト）
+    DBSCAN_ANN_THRESHOLD: int = 5000  # これを超える枚数ではhnswlibの近似近傍探索を使う（インストール時のみ）
+    DBSCAN_ANN_NEIGHBORS: int = 32  # 近似近傍探索で各画像について調べる近傍数
+    DBSCAN_GPU_GRAPH: bool = True  # 特徴量がGPU上にある場合、距離計算をFP16でGPU上で行う
+    DBSCAN_CACHE_MAX_FILES: int = 50  # 保存しておくクラスタリング結果のキャッシュ数（古いものから削除）
     
     # グリッドビュー設定
     DEFAULT_GRID_THUMBNAIL_SIZE: int = 160  # デフォルトサムネイルサイズ（大きく）
@@ -92,10 +112,17 @@ class AppConfig:
     # AI設定
     CLIP_MODEL_NAME: str = "openai/clip-vit-base-patch32"
     AI_SUGGESTION_THRESHOLD: float = 0.3
+    CACHE_DIR: str = "cache"  # フォルダ名のテキスト特徴量などのキャッシュ保存先
+    AI_ONNX_RUNTIME: bool = True  # onnxruntimeがあればONNXに書き出したモデルで推論（初回のみ書き出し）
+    AI_QUANTIZE: bool = True  # CPU推論時にLinear層をINT8へ動的量子化（FalseでFP32のまま）
+    AI_CPU_BF16: bool = True  # BF16命令のあるCPUではINT8量子化の代わりにbfloat16 autocastで推論
+    AI_TORCH_COMPILE: bool = True  # 画像エンコーダをtorch.compileで最適化（モデル読み込み時にコンパイル）
     
     # ログ設定
     LOG_FILE: str = "debug.log"
     LOG_LEVEL: str = "DEBUG"
+    LOG_MAX_BYTES: int = 5 * 1024 * 1024  # ログファイルのローテーションサイズ
+    LOG_BACKUP_COUNT: int = 3
     
     # セキュリティ設定
     MAX_PATH_LENGTH: int = 4096  # 一般的なOSの最大パス長
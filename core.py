@@ -7,7 +7,9 @@ import os
 import time
 import hashlib
 import logging
+from logging.handlers import RotatingFileHandler
 import traceback
+from functools import lru_cache
 from typing import Optional, List, Tuple, Set, Any
 from pathlib import Path
 
@@ -33,20 +35,38 @@ def setup_logging() -> None:
     """
     ロギング設定を初期化
     
-    ファイルとコンソールの両方にログを出力します。
+    ログはローテーションするファイルに出力し、コンソールには警告以上のみ出力します。
     """
     log_level = getattr(logging, config.LOG_LEVEL.upper(), logging.DEBUG)
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(logging.WARNING)
     logging.basicConfig(
         level=log_level,
         format='%(asctime)s [%(levelname)s] (%(threadName)s) - %(message)s',
         handlers=[
-            logging.FileHandler(config.LOG_FILE, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
+            RotatingFileHandler(config.LOG_FILE, maxBytes=config.LOG_MAX_BYTES,
+                                backupCount=config.LOG_BACKUP_COUNT, encoding='utf-8'),
+            console
         ]
     )
     logging.getLogger("PIL").setLevel(logging.WARNING)
 
 
+def create_error_image(size: int) -> QImage:
+    """
+    エラー表示用のプレースホルダー画像を生成（ワーカースレッドからも使用可）
+    
+    Args:
+        size: 画像のサイズ（ピクセル）
+        
+    Returns:
+        エラー表示用のQImage
+    """
+    img = QImage(size, size, QImage.Format.Format_RGB32)
+    img.fill(QColor("#222222"))
+    return img
+
+
 def create_error_pixmap(size: int) -> QPixmap:
     """
     エラー表示用のプレースホルダー画像を生成
@@ -57,13 +77,11 @@ def create_error_pixmap(size: int) -> QPixmap:
     Returns:
         エラー表示用のQPixmap
     """
-    img = QImage(size, size, QImage.Format.Format_RGB32)
-    img.fill(QColor("#222222"))
-    return QPixmap.fromImage(img)
+    return QPixmap.fromImage(create_error_image(size))
 
 
 def get_db_thumbnail(db_manager: 'DatabaseManager', file_id: int, file_path: str, 
-                     size_wh: int = None) -> QPixmap:
+                     size_wh: int = None, blob: Optional[bytes] = None) -> QPixmap:
     """
     サムネイル取得関数
     
@@ -74,29 +92,76 @@ def get_db_thumbnail(db_manager: 'DatabaseManager', file_id: int, file_path: str
         file_id: ファイルID
         file_path: ファイルパス
         size_wh: サムネイルサイズ（デフォルト: config.DEFAULT_THUMBNAIL_SIZE）
+        blob: get_thumbnails で取得済みのサムネイル画像データ（あればDBを参照しない）
         
     Returns:
         サムネイル画像のQPixmap
     """
+    return QPixmap.fromImage(get_db_thumbnail_image(db_manager, file_id, file_path, size_wh, blob))
+
+
+def thumbnail_cache_key(file_id: int, size_wh: int) -> str:
+    """QPixmapCacheに登録するサムネイルのキー"""
+    return f"thumb:{file_id}:{size_wh}"
+
+
+def thumbnail_from_blob(blob: bytes, size_wh: int) -> Optional[QImage]:
+    """
+    DBに保存されたサムネイルのバイト列をQImageに変換（ワーカースレッドからも使用可）
+    
+    Args:
+        blob: サムネイル画像データ
+        size_wh: サムネイルサイズ（これより大きい場合は縮小）
+        
+    Returns:
+        QImage（デコードできない場合はNone）
+    """
+    buffer = QBuffer()
+    buffer.setData(blob)
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    # 大きい場合はデコード時に縮小する（デコード後にscaledするより軽い）
+    orig_size = reader.size()
+    if orig_size.isValid() and (orig_size.width() > size_wh or orig_size.height() > size_wh):
+        reader.setScaledSize(orig_size.scaled(size_wh, size_wh, Qt.AspectRatioMode.KeepAspectRatio))
+    img = reader.read()
+    if img.isNull():
+        return None
+    return img
+
+
+def get_db_thumbnail_image(db_manager: 'DatabaseManager', file_id: int, file_path: str,
+                           size_wh: int = None, blob: Optional[bytes] = None) -> QImage:
+    """
+    get_db_thumbnail のQImage版（ワーカースレッドからも使用可）
+    
+    Args:
+        db_manager: データベースマネージャーインスタンス
+        file_id: ファイルID
+        file_path: ファイルパス
+        size_wh: サムネイルサイズ（デフォルト: config.DEFAULT_THUMBNAIL_SIZE）
+        blob: get_thumbnails で取得済みのサムネイル画像データ（あればDBを参照しない）
+        
+    Returns:
+        サムネイル画像のQImage
+    """
     if size_wh is None:
         size_wh = config.DEFAULT_THUMBNAIL_SIZE
     
     # パス検証
     if not config.validate_path(file_path):
         logger.warning(f"Invalid path detected: {file_path}")
-        return create_error_pixmap(size_wh)
+        return create_error_image(size_wh)
     
     # 1. DBから取得
     if file_id and file_id > 0:
         try:
-            blob = db_manager.get_thumbnail(file_id)
+            if blob is None:
+                blob = db_manager.get_thumbnail(file_id)
             if blob:
-                pix = QPixmap()
-                if pix.loadFromData(blob):
-                    if pix.width() > size_wh or pix.height() > size_wh:
-                        pix = pix.scaled(size_wh, size_wh, Qt.AspectRatioMode.KeepAspectRatio,
-                                         Qt.TransformationMode.SmoothTransformation)
-                    return pix
+                img = thumbnail_from_blob(blob, size_wh)
+                if img is not None:
+                    return img
         except Exception as e:
             logger.error(f"Failed to load thumbnail from DB (id={file_id}): {e}")
 
@@ -104,7 +169,7 @@ def get_db_thumbnail(db_manager: 'DatabaseManager', file_id: int, file_path: str
     try:
         if not os.path.exists(file_path):
             logger.warning(f"File not found: {file_path}")
-            return create_error_pixmap(size_wh)
+            return create_error_image(size_wh)
 
         reader = QImageReader(file_path)
         reader.setAutoTransform(True)
@@ -128,17 +193,117 @@ def get_db_thumbnail(db_manager: 'DatabaseManager', file_id: int, file_path: str
                 except Exception as e:
                     logger.error(f"Failed to save thumbnail to DB (id={file_id}): {e}")
 
-            return QPixmap.fromImage(img)
+            return img
 
-        return create_error_pixmap(size_wh)
+        return create_error_image(size_wh)
 
     except (OSError, IOError) as e:
         logger.error(f"IO error while generating thumbnail ({os.path.basename(file_path)}): {e}")
-        return create_error_pixmap(size_wh)
+        return create_error_image(size_wh)
     except Exception as e:
         logger.error(f"Unexpected error while generating thumbnail ({os.path.basename(file_path)}): {e}", 
                      exc_info=True)
-        return create_error_pixmap(size_wh)
+        return create_error_image(size_wh)
+
+
+def thumbnail_disk_cache_path(file_path: str, size: QSize) -> Optional[str]:
+    """
+    縮小済みサムネイルのディスクキャッシュのパスを取得
+    
+    キーはパス・更新日時・サイズから作るため、元画像が更新されると別のファイルになります。
+    
+    Returns:
+        キャッシュファイルのパス（元画像が無い場合はNone）
+    """
+    try:
+        mtime_ns = os.stat(file_path).st_mtime_ns
+    except OSError:
+        return None
+    raw = f"{file_path}|{mtime_ns}|{size.width()}x{size.height()}".encode("utf-8")
+    key = hashlib.blake2b(raw, digest_size=16).hexdigest()
+    return os.path.join(config.CACHE_DIR, "thumbs", key[:2], f"{key}.jpg")
+
+
+def save_thumbnail_disk_cache(cache_path: str, img: QImage) -> None:
+    """サムネイルをディスクキャッシュに保存（書き込み途中のファイルを読まないよう一時ファイル経由）"""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{id(img)}.tmp"
+        if img.save(tmp_path, "JPG", quality=config.THUMBNAIL_QUALITY):
+            os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Failed to save thumbnail cache {cache_path}: {e}")
+
+
+def prune_thumbnail_disk_cache(limit_mb: int = None) -> int:
+    """
+    サムネイルのディスクキャッシュを上限サイズ以下に削減
+    
+    キャッシュヒット時に更新日時を更新しているため、更新日時の古い順（LRU）に削除します。
+    
+    Args:
+        limit_mb: 上限サイズ（MB、デフォルト: config.THUMB_DISK_CACHE_LIMIT_MB）
+        
+    Returns:
+        削除したファイル数
+    """
+    if limit_mb is None:
+        limit_mb = config.THUMB_DISK_CACHE_LIMIT_MB
+    root = os.path.join(config.CACHE_DIR, "thumbs")
+    if not os.path.isdir(root):
+        return 0
+
+    entries = []
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+    limit = max(0, limit_mb) * 1024 * 1024
+    if total <= limit:
+        return 0
+
+    entries.sort()
+    removed = 0
+    for _mtime, size, path in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    logger.info(f"Pruned {removed} thumbnail cache files (limit {limit_mb} MB)")
+    return removed
+
+
+def laplacian_variance(gray: np.ndarray, max_dim: int = None) -> float:
+    """
+    グレースケール画像のLaplacian分散（ピンボケスコア）を計算
+    
+    長辺がmax_dimを超える画像は縮小してから、単精度でLaplacian（3x3）を1回適用します。
+    
+    Args:
+        gray: グレースケール画像（uint8）
+        max_dim: 計算前に縮小する長辺の最大値（デフォルト: config.BLUR_ANALYSIS_MAX_DIM）
+        
+    Returns:
+        Laplacian分散
+    """
+    if max_dim is None:
+        max_dim = config.BLUR_ANALYSIS_MAX_DIM
+    h, w = gray.shape[:2]
+    scale = max_dim / max(h, w)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
 
 
 def format_eta(seconds: float) -> str:
@@ -197,6 +362,7 @@ def hamming_dist(h1: int, h2: int) -> int:
     return (h1 ^ h2).bit_count()
 
 
+@lru_cache(maxsize=256)
 def format_file_size(size_bytes: int) -> str:
     """
     ファイルサイズを人間が読みやすい形式にフォーマット
@@ -216,6 +382,22 @@ def format_file_size(size_bytes: int) -> str:
     return f"{size_bytes:.1f} PB"
 
 
+@lru_cache(maxsize=4096)
+def _read_image_size(path: str, mtime_ns: int, file_size: int) -> Tuple[Optional[int], Optional[int]]:
+    """
+    画像の幅と高さを取得（更新日時・サイズをキーに含めてキャッシュ）
+    
+    Returns:
+        (幅, 高さ)。画像でない場合は (None, None)
+    """
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return img.width, img.height
+    except Exception:
+        return None, None  # 画像でない場合は無視
+
+
 def get_file_info(path: str) -> dict:
     """
     ファイルの詳細情報を取得
@@ -234,20 +416,16 @@ def get_file_info(path: str) -> dict:
     }
     
     try:
-        if not os.path.exists(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
             return result
             
         result['exists'] = True
-        result['file_size'] = os.path.getsize(path)
+        result['file_size'] = st.st_size
         
-        # 画像サイズを取得
-        try:
-            from PIL import Image
-            with Image.open(path) as img:
-                result['image_width'] = img.width
-                result['image_height'] = img.height
-        except Exception:
-            pass  # 画像でない場合は無視
+        # 画像サイズを取得（同じファイルを何度もプレビューする場合はキャッシュを使う）
+        result['image_width'], result['image_height'] = _read_image_size(path, st.st_mtime_ns, st.st_size)
             
     except Exception as e:
         logger.warning(f"Failed to get file info for {path}: {e}")
@@ -313,11 +491,15 @@ class ScannerThread(QThread):
         self.status.emit(f"新規 {total} 件を登録中...")
         t_start = time.time()
 
+        batch = []
         for i, p in enumerate(new_files):
             if not self.run_flag: break
             try:
                 st = os.stat(p)
-                self.db.insert_file(p, st.st_size, get_capture_time(p))
+                batch.append((p, st.st_size, get_capture_time(p)))
+                if len(batch) >= config.BATCH_SIZE_INSERT:
+                    self.db.insert_files(batch)
+                    batch = []
                 
                 # SSD負荷軽減措置
                 if config.LOW_LOAD_MODE:
@@ -333,6 +515,9 @@ class ScannerThread(QThread):
             except Exception as e:
                 print(f"Scanner Skip Error: {e}", flush=True)
 
+        if batch:
+            self.db.insert_files(batch)
+
         self.db.set_setting("root_path", self.root)
         self.status.emit("完了")
         self.finished.emit()
@@ -381,7 +566,7 @@ class AnalyzerThread(QThread):
                 logger.warning(f"Failed to decode image for blur calculation: {p}")
                 return 0.0
             
-            return float(cv2.Laplacian(img, cv2.CV_64F).var())
+            return laplacian_variance(img)
         except (OSError, IOError) as e:
             logger.error(f"IO error calculating blur for {p}: {e}")
             return 0.0
@@ -522,7 +707,9 @@ class ImageLoader(QRunnable):
     非同期で画像を読み込み、サムネイルを生成します。
     """
     
-    def __init__(self, idx: int, path: str, size: QSize):
+    def __init__(self, idx: int, path: str, size: QSize,
+                 quality: Qt.TransformationMode = Qt.TransformationMode.SmoothTransformation,
+                 disk_cache: bool = False):
         """
         画像ローダーを初期化
         
@@ -530,11 +717,15 @@ class ImageLoader(QRunnable):
             idx: 画像のインデックス
             path: 画像ファイルパス
             size: サムネイルサイズ
+            quality: 縮小品質（FastTransformationは先読み・スクロール中の一次表示用）
+            disk_cache: 縮小済みの画像をCACHE_DIRに保存し、次回はそれを読み込む（DBに無い画像用）
         """
         super().__init__()
         self.idx = idx
         self.path = path
         self.size = size
+        self.quality = quality
+        self.disk_cache = disk_cache
         self.signals = ImageLoaderSignals()
 
     def run(self) -> None:
@@ -543,26 +734,70 @@ class ImageLoader(QRunnable):
         """
         if not config.validate_path(self.path):
             logger.warning(f"Invalid path for ImageLoader: {self.path}")
-            self.signals.finished.emit(self.idx, create_error_pixmap(self.size.width()))
+            self.signals.finished.emit(self.idx, create_error_image(self.size.width()))
             return
         
+        cache_path = None
+        if self.disk_cache and self.quality == Qt.TransformationMode.SmoothTransformation:
+            cache_path = thumbnail_disk_cache_path(self.path, self.size)
+            if cache_path and os.path.exists(cache_path):
+                img = QImage(cache_path)
+                if not img.isNull():
+                    # 起動時の削減でLRU順に消せるよう、ヒットしたファイルの更新日時を更新
+                    try:
+                        os.utime(cache_path)
+                    except OSError:
+                        pass
+                    self.signals.finished.emit(self.idx, img)
+                    return
+        
         try:
             reader = QImageReader(self.path)
             reader.setScaledSize(reader.size().scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio))
             reader.setAutoTransform(True)
+            # JPEGプラグインは quality < 50 で高速なIDCT/縮小処理を使う
+            if self.quality == Qt.TransformationMode.FastTransformation:
+                reader.setQuality(25)
             img = reader.read()
             
             if img.isNull():
                 logger.warning(f"Failed to read image: {self.path}")
-                self.signals.finished.emit(self.idx, create_error_pixmap(self.size.width()))
+                self.signals.finished.emit(self.idx, create_error_image(self.size.width()))
             else:
+                if cache_path:
+                    save_thumbnail_disk_cache(cache_path, img)
                 self.signals.finished.emit(self.idx, img)
         except (OSError, IOError) as e:
             logger.error(f"IO error loading image {self.path}: {e}")
-            self.signals.finished.emit(self.idx, create_error_pixmap(self.size.width()))
+            self.signals.finished.emit(self.idx, create_error_image(self.size.width()))
         except Exception as e:
             logger.error(f"Unexpected error loading image {self.path}: {e}", exc_info=True)
-            self.signals.finished.emit(self.idx, create_error_pixmap(self.size.width()))
+            self.signals.finished.emit(self.idx, create_error_image(self.size.width()))
 
 
-class ImageLoaderSignals(QObject): finished = pyqtSignal(int, QImage)
\ No newline at end of file
+class ImageLoaderSignals(QObject): finished = pyqtSignal(int, QImage)
+
+class DbThumbnailLoaderSignals(QObject): finished = pyqtSignal(int, int, QImage)
+
+
+class DbThumbnailLoader(QRunnable):
+    """
+    DBのサムネイル読み込み用のワーカークラス
+    
+    get_db_thumbnail_image をスレッドプール上で実行します（DBに無ければ生成して保存）。
+    結果は (ファイルID, 要求サイズ, QImage) で通知します。
+    """
+    
+    def __init__(self, db_manager: 'DatabaseManager', file_id: int, file_path: str, size_wh: int,
+                 blob: Optional[bytes] = None):
+        super().__init__()
+        self.db = db_manager
+        self.file_id = file_id
+        self.file_path = file_path
+        self.size_wh = size_wh
+        self.blob = blob
+        self.signals = DbThumbnailLoaderSignals()
+
+    def run(self) -> None:
+        img = get_db_thumbnail_image(self.db, self.file_id, self.file_path, self.size_wh, self.blob)
+        self.signals.finished.emit(self.file_id, self.size_wh, img)
\ No newline at end of file
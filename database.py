@@ -11,6 +11,11 @@ from config import config
 
 logger = logging.getLogger(__name__)
 
+# ピンボケスコアの算出方法のバージョン（変更時はスコアの尺度が変わるため解析をやり直す）
+# 2: 長辺BLUR_ANALYSIS_MAX_DIMへ縮小してから単精度でLaplacian分散を計算
+BLUR_SCORE_VERSION = 2
+BLUR_SCORE_VERSION_KEY = 'blur_score_version'
+
 class DatabaseManager:
     """
     データベース管理クラス
@@ -40,6 +45,11 @@ class DatabaseManager:
             self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
             if config.DB_WAL_MODE:
                 self.conn.execute("PRAGMA journal_mode=WAL")
+                # WALではNORMALでも整合性は保たれ、コミット毎のfsyncが不要になる
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA temp_store=MEMORY")
+            self.conn.execute(f"PRAGMA mmap_size={config.DB_MMAP_SIZE}")
+            self.conn.execute(f"PRAGMA cache_size=-{config.DB_CACHE_SIZE_KB}")
         except sqlite3.Error as e:
             logger.error(f"Failed to connect to database {self.db_path}: {e}")
             raise
@@ -59,52 +69,108 @@ class DatabaseManager:
                     file_id INTEGER PRIMARY KEY, data BLOB, FOREIGN KEY(file_id) REFERENCES files(id))''')
                 c.execute('''CREATE TABLE IF NOT EXISTS settings (
                     key TEXT PRIMARY KEY, value TEXT)''')
+                c.execute('''CREATE TABLE IF NOT EXISTS clip_features (
+                    file_hash TEXT PRIMARY KEY, dim INTEGER, vec BLOB)''')
 
                 c.execute('CREATE INDEX IF NOT EXISTS idx_path ON files (path)')
                 c.execute('CREATE INDEX IF NOT EXISTS idx_status ON files (status)')
                 c.execute('CREATE INDEX IF NOT EXISTS idx_hash ON files (hash_value)')
                 c.execute('CREATE INDEX IF NOT EXISTS idx_mtime ON files (mtime)')
+                self._migrate_blur_scores(c)
                 self.conn.commit()
             except sqlite3.Error as e:
                 logger.error(f"Failed to initialize database: {e}")
                 raise
 
+    def _migrate_blur_scores(self, c: sqlite3.Cursor) -> None:
+        """
+        ピンボケスコアの算出方法が変わっていたら、古い尺度のスコアを捨てて解析し直させる
+        
+        解析済みのファイルは未処理に戻し（AnalyzerThreadが再解析する）、
+        整理済みのファイルは再解析されないためスコアのみ消す（ピンボケ一覧の対象外になる）。
+        """
+        row = c.execute("SELECT value FROM settings WHERE key = ?", (BLUR_SCORE_VERSION_KEY,)).fetchone()
+        if row and row[0] == str(BLUR_SCORE_VERSION):
+            return
+        requeued = c.execute(
+            "UPDATE files SET status = 'unprocessed', blur_score = NULL "
+            "WHERE status = 'analyzed' AND blur_score IS NOT NULL").rowcount
+        c.execute("UPDATE files SET blur_score = NULL WHERE status != 'unprocessed' AND blur_score IS NOT NULL")
+        c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                  (BLUR_SCORE_VERSION_KEY, str(BLUR_SCORE_VERSION)))
+        if requeued:
+            logger.info(f"Blur score method changed: {requeued} files queued for re-analysis")
+
     def rebuild_db(self) -> None:
         """
         データベースを完全に再構築（全データ削除）
         
+        ファイルは作り直さず、単一トランザクション内で全テーブルを空にします。
+        失敗した場合のみ、ファイル削除による再作成にフォールバックします。
+        
         注意: この操作は不可逆です。すべてのデータが削除されます。
         """
         with self.lock:
             try:
-                if self.conn:
-                    try:
-                        self.conn.close()
-                    except sqlite3.Error as e:
-                        logger.warning(f"Error closing connection: {e}")
-                
-                # データベースファイルとWALファイルを削除
-                db_files = [self.db_path, f"{self.db_path}-wal", f"{self.db_path}-shm"]
-                for db_file in db_files:
-                    if os.path.exists(db_file):
-                        try:
-                            os.remove(db_file)
-                        except (OSError, IOError) as e:
-                            logger.error(f"Failed to remove database file {db_file}: {e}")
-                            raise
-                
-                # 再接続して初期化
-                self._connect()
-                self.init_db()
+                c = self.conn.cursor()
+                c.execute("BEGIN IMMEDIATE")
+                c.execute("DELETE FROM thumbnails")
+                c.execute("DELETE FROM files")
+                c.execute("DELETE FROM settings")
+                c.execute("DELETE FROM clip_features")
+                c.execute("DELETE FROM sqlite_sequence WHERE name = 'files'")
+                c.execute("INSERT INTO settings (key, value) VALUES (?, ?)",
+                          (BLUR_SCORE_VERSION_KEY, str(BLUR_SCORE_VERSION)))
+                self.conn.commit()
+
+                # 巨大なDBのみ領域を解放する（VACUUMは全ページを書き直すため重い）
+                if os.path.getsize(self.db_path) > config.DB_VACUUM_THRESHOLD:
+                    self.conn.execute("VACUUM")
+                if config.DB_WAL_MODE:
+                    self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self.conn.execute("PRAGMA optimize")
                 logger.info("Database rebuilt successfully")
-            except Exception as e:
-                logger.error(f"DB Rebuild Error: {e}", exc_info=True)
-                # 再接続を試みる
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"In-place DB reset failed, recreating database file: {e}")
                 try:
-                    self._connect()
-                except Exception as reconnect_error:
-                    logger.error(f"Failed to reconnect after rebuild error: {reconnect_error}")
-                    raise
+                    self.conn.rollback()
+                except sqlite3.Error:
+                    pass
+                self._recreate_db_file()
+
+    def _recreate_db_file(self) -> None:
+        """
+        データベースファイルを削除して作り直す（rebuild_dbのフォールバック）
+        """
+        try:
+            if self.conn:
+                try:
+                    self.conn.close()
+                except sqlite3.Error as e:
+                    logger.warning(f"Error closing connection: {e}")
+            
+            # データベースファイルとWALファイルを削除
+            db_files = [self.db_path, f"{self.db_path}-wal", f"{self.db_path}-shm"]
+            for db_file in db_files:
+                if os.path.exists(db_file):
+                    try:
+                        os.remove(db_file)
+                    except (OSError, IOError) as e:
+                        logger.error(f"Failed to remove database file {db_file}: {e}")
+                        raise
+            
+            # 再接続して初期化
+            self._connect()
+            self.init_db()
+            logger.info("Database rebuilt successfully")
+        except Exception as e:
+            logger.error(f"DB Rebuild Error: {e}", exc_info=True)
+            # 再接続を試みる
+            try:
+                self._connect()
+            except Exception as reconnect_error:
+                logger.error(f"Failed to reconnect after rebuild error: {reconnect_error}")
+                raise
 
     def set_setting(self, key: str, value: Any) -> None:
         """
@@ -187,6 +253,73 @@ class DatabaseManager:
                 logger.error(f"Failed to get thumbnail for file_id {fid}: {e}")
                 return None
 
+    def get_thumbnails(self, fids: List[int]) -> dict:
+        """
+        複数のサムネイルをまとめて取得
+        
+        Args:
+            fids: ファイルIDのリスト
+            
+        Returns:
+            {ファイルID: サムネイル画像データ} の辞書（存在するもののみ）
+        """
+        result = {}
+        if not fids:
+            return result
+        with self.lock:
+            try:
+                for i in range(0, len(fids), config.BATCH_SIZE_DELETE):
+                    chunk = fids[i:i + config.BATCH_SIZE_DELETE]
+                    placeholders = ','.join('?' for _ in chunk)
+                    for fid, data in self.conn.execute(
+                            f"SELECT file_id, data FROM thumbnails WHERE file_id IN ({placeholders})", chunk):
+                        result[fid] = data
+            except sqlite3.Error as e:
+                logger.error(f"Failed to get {len(fids)} thumbnails: {e}")
+        return result
+
+    def get_clip_features(self, keys: List[str]) -> dict:
+        """
+        キャッシュ済みのCLIP画像特徴量を取得
+        
+        Args:
+            keys: 特徴量キーのリスト
+            
+        Returns:
+            {キー: 特徴量(FP16のバイト列)} の辞書（存在するもののみ）
+        """
+        result = {}
+        if not keys:
+            return result
+        with self.lock:
+            try:
+                for i in range(0, len(keys), config.BATCH_SIZE_DELETE):
+                    chunk = keys[i:i + config.BATCH_SIZE_DELETE]
+                    placeholders = ','.join('?' for _ in chunk)
+                    for key, vec in self.conn.execute(
+                            f"SELECT file_hash, vec FROM clip_features WHERE file_hash IN ({placeholders})", chunk):
+                        result[key] = vec
+            except sqlite3.Error as e:
+                logger.error(f"Failed to get CLIP features: {e}")
+        return result
+
+    def save_clip_features(self, rows: List[Tuple[str, int, bytes]]) -> None:
+        """
+        CLIP画像特徴量をまとめて保存
+        
+        Args:
+            rows: (キー, 次元数, 特徴量(FP16のバイト列)) のタプルのリスト
+        """
+        if not rows:
+            return
+        with self.lock:
+            try:
+                self.conn.executemany("INSERT OR REPLACE INTO clip_features (file_hash, dim, vec) VALUES (?, ?, ?)",
+                                      rows)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to save {len(rows)} CLIP features: {e}")
+
     def insert_file(self, path: str, size: int, mtime: float) -> bool:
         """
         ファイル情報をデータベースに挿入
@@ -216,6 +349,38 @@ class DatabaseManager:
             logger.error(f"Failed to insert file {path}: {e}")
             return False
 
+    def insert_files(self, entries: List[Tuple[str, int, float]]) -> int:
+        """
+        複数のファイル情報を1トランザクションでまとめて挿入
+        
+        Args:
+            entries: (path, size, mtime) のタプルのリスト
+            
+        Returns:
+            新規に挿入された件数
+        """
+        rows = []
+        for path, size, mtime in entries:
+            if not config.validate_path(path):
+                logger.warning(f"Invalid path for insert_files: {path}")
+                continue
+            name = os.path.basename(path)
+            rows.append((path, name, os.path.splitext(name)[1].lower(), size, mtime))
+        if not rows:
+            return 0
+        
+        try:
+            with self.lock:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO files (path, filename, extension, size, mtime) VALUES (?, ?, ?, ?, ?)',
+                    rows)
+                self.conn.commit()
+                return self.conn.total_changes - before
+        except sqlite3.Error as e:
+            logger.error(f"Failed to insert {len(rows)} files: {e}")
+            return 0
+
     def remove_files(self, paths: Set[str]) -> None:
         """
         複数のファイルをデータベースから削除
@@ -261,6 +426,23 @@ class DatabaseManager:
                 logger.error(f"Failed to get file count: {e}")
                 return 0
 
+    def get_library_summary(self) -> Tuple[int, Optional[str], Optional[str]]:
+        """
+        ライブラリの概要を1回のクエリでまとめて取得
+        
+        Returns:
+            (ファイル数, スキャン対象フォルダ, 削除フォルダ) のタプル
+        """
+        with self.lock:
+            try:
+                return self.conn.execute(
+                    "SELECT (SELECT COUNT(*) FROM files), "
+                    "(SELECT value FROM settings WHERE key = 'root_path'), "
+                    "(SELECT value FROM settings WHERE key = 'trash_folder')").fetchone()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to get library summary: {e}")
+                return 0, None, None
+
     def get_unprocessed_count(self) -> int:
         """
         未処理ファイルの数を取得
@@ -329,6 +511,29 @@ class DatabaseManager:
             'SELECT id, path FROM files WHERE blur_score > 0 AND blur_score < ? AND status != "trash" ORDER BY blur_score ASC LIMIT 200',
             (th,)).fetchall()
 
+    def count_blurry_files(self, th, limit=200):
+        """get_blurry_files / iter_blurry_files が返す件数（上限limit）"""
+        with self.lock:
+            count = self.conn.execute(
+                'SELECT COUNT(*) FROM files WHERE blur_score > 0 AND blur_score < ? AND status != "trash"',
+                (th,)).fetchone()[0]
+        return min(count, limit)
+
+    def iter_blurry_files(self, th, chunk_size=64, limit=200):
+        """
+        ピンボケ候補を (id, path, サムネイル画像データ or None) の chunk_size 件ずつのリストで順に返すジェネレータ
+        
+        件数は最大limit件と少ないため、ロック中に全件読み切ってカーソルを閉じ、分割はPython側で行う
+        （共有接続上に読み出し途中のクエリを残さない）。サムネイルはJOINで同じクエリから取得する。
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                'SELECT f.id, f.path, t.data FROM files f LEFT JOIN thumbnails t ON t.file_id = f.id '
+                'WHERE f.blur_score > 0 AND f.blur_score < ? AND f.status != "trash" ORDER BY f.blur_score ASC LIMIT ?',
+                (th, limit)).fetchall()
+        for i in range(0, len(rows), chunk_size):
+            yield rows[i:i + chunk_size]
+
     def get_files_with_phash(self):
         with self.lock: return self.conn.execute(
             "SELECT id, path, p_hash, mtime FROM files WHERE p_hash IS NOT NULL AND status != 'trash'").fetchall()
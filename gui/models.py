@@ -1,27 +1,51 @@
-from PyQt6.QtCore import QAbstractListModel, QSize, QThreadPool, QModelIndex, Qt
-from PyQt6.QtGui import QColor
+from PyQt6.QtCore import QAbstractListModel, QSize, QThreadPool, QModelIndex, Qt, QTimer
+from PyQt6.QtGui import QColor, QPixmap, QPixmapCache
 
-from core import ImageLoader
+from core import ImageLoader, DbThumbnailLoader, thumbnail_cache_key
+
+# data() はスクロール中に大量に呼ばれるため、ロール定数と仮画像の色を事前に束縛しておく
+_DECO = Qt.ItemDataRole.DecorationRole
+_TOOLTIP = Qt.ItemDataRole.ToolTipRole
+_DISPLAY = Qt.ItemDataRole.DisplayRole
+_USER = Qt.ItemDataRole.UserRole
+_PLACEHOLDER = QColor("#2b2b2b")
+
+# スクロールが止まってから可視範囲を高品質で読み直すまでの待ち時間(ms)
+_REFINE_DELAY_MS = 200
 
 class PhotoModel(QAbstractListModel):
     def __init__(self, db_manager, icon_size=None):
         super().__init__()
         self.db = db_manager
         self.file_list = []
-        self.image_cache = {}
+        self._thumbs = []  # 行番号で直接引けるQPixmapキャッシュ (未ロードはNone)
+        self._fast_rows = set()  # 高速モードで読込済み/読込中の行
+        self._view = None
         self.icon_size = icon_size if icon_size else QSize(180, 180)
-        self.thread_pool = QThreadPool()
+        self.thread_pool = QThreadPool.globalInstance()
+
+        self._refine_timer = QTimer(self)
+        self._refine_timer.setSingleShot(True)
+        self._refine_timer.setInterval(_REFINE_DELAY_MS)
+        self._refine_timer.timeout.connect(self._refine_visible)
+
+    def set_view(self, view):
+        """スクロール停止後に可視範囲を高品質で読み直すため、表示先のビューを登録する"""
+        self._view = view
+        view.verticalScrollBar().valueChanged.connect(self.schedule_refine)
 
     def reload(self):
         self.beginResetModel()
         self.file_list = self.db.get_all_files()
-        self.image_cache.clear()
+        self._thumbs = [None] * len(self.file_list)
+        self._fast_rows.clear()
         self.endResetModel()
 
     def clear(self):
         self.beginResetModel()
         self.file_list = []
-        self.image_cache = {}
+        self._thumbs = []
+        self._fast_rows.clear()
         self.endResetModel()
 
     def rowCount(self, parent=QModelIndex()):
@@ -30,23 +54,148 @@ class PhotoModel(QAbstractListModel):
     def data(self, index, role):
         if not index.isValid(): return None
         row = index.row()
-        if role == Qt.ItemDataRole.DecorationRole:
-            if row in self.image_cache:
-                return self.image_cache[row]
-            else:
-                self.load_image_async(row)
-                return QColor("#2b2b2b")
-        if role == Qt.ItemDataRole.ToolTipRole: return self.file_list[row]
+        if role == _DECO:
+            img = self._thumbs[row]
+            if img is not None:
+                return img
+            self.load_image_async(row)
+            return _PLACEHOLDER
+        if role == _TOOLTIP: return self.file_list[row]
         return None
 
     def load_image_async(self, row):
-        if row in self.image_cache: return
-        loader = ImageLoader(row, self.file_list[row], self.icon_size)
+        if self._thumbs[row] is not None or row in self._fast_rows: return
+        self._fast_rows.add(row)
+        loader = ImageLoader(row, self.file_list[row], self.icon_size, Qt.TransformationMode.FastTransformation)
         loader.signals.finished.connect(self.on_loaded)
         self.thread_pool.start(loader)
 
+    def schedule_refine(self, *_):
+        self._refine_timer.start()
+
+    def _refine_visible(self):
+        """画面内に残っている高速読込の行だけを、優先度を上げて高品質で読み直す"""
+        view = self._view
+        if view is None or not self._fast_rows: return
+        area = view.viewport().rect()
+        for row in list(self._fast_rows):
+            if self._thumbs[row] is None: continue
+            if not view.visualRect(self.index(row)).intersects(area): continue
+            self._fast_rows.discard(row)
+            loader = ImageLoader(row, self.file_list[row], self.icon_size, Qt.TransformationMode.SmoothTransformation)
+            loader.signals.finished.connect(self.on_loaded)
+            self.thread_pool.start(loader, 1)
+
     def on_loaded(self, row, image):
         if row >= len(self.file_list): return
-        self.image_cache[row] = image
+        # QImageはワーカーで生成し、描画用のQPixmapへはGUIスレッドで一度だけ変換する
+        self._thumbs[row] = QPixmap.fromImage(image)
         idx = self.index(row)
-        self.dataChanged.emit(idx, idx, [Qt.ItemDataRole.DecorationRole])
+        self.dataChanged.emit(idx, idx, [_DECO])
+        if row in self._fast_rows:
+            self.schedule_refine()
+
+
+class ThumbnailListModel(QAbstractListModel):
+    """
+    DB登録済みファイルの一覧モデル（ピンボケ検出結果・重複グループで共用）
+
+    サムネイルは表示される行だけQPixmapへ変換し、QPixmapCacheに (ファイルID, サイズ) で
+    キャッシュする。ワーカーが用意したQImageが無い行は、表示された時点でスレッドプールから
+    読み込む（DBに無ければ生成）。
+    """
+    def __init__(self, db_manager, thumb_size=120):
+        super().__init__()
+        self.db = db_manager
+        self.thumb_size = thumb_size
+        self.items = []  # {'id', 'path', 'name', 'thumb'} の辞書（'thumb_blob' があればDBを参照せずに使う）
+        self.show_path = False  # リスト表示ではファイル名の下にパスも出す
+        self._loading = set()  # 読み込み中の (ファイルID, サイズ)
+        self.thread_pool = QThreadPool.globalInstance()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.items)
+
+    def data(self, index, role):
+        if not index.isValid(): return None
+        item = self.items[index.row()]
+        if role == _DECO:
+            return self._load_pixmap(item)
+        if role == _DISPLAY:
+            name = item['name']
+            return f"{name}\n{item['path']}" if self.show_path else name
+        if role == _TOOLTIP: return item['path']
+        if role == _USER: return item
+        return None
+
+    def _load_pixmap(self, item):
+        key = thumbnail_cache_key(item['id'], self.thumb_size)
+        pix = QPixmapCache.find(key)
+        if pix is not None and not pix.isNull():
+            return pix
+        thumb = item.get('thumb')
+        if thumb is None:
+            self._load_async(item)
+            return _PLACEHOLDER
+        # 変換後はQImageを手放し、以降はQPixmapCacheから引く（追い出された場合はDBから再取得）
+        item['thumb'] = None
+        pix = QPixmap.fromImage(thumb)
+        if pix.width() > self.thumb_size or pix.height() > self.thumb_size:
+            pix = pix.scaled(self.thumb_size, self.thumb_size, Qt.AspectRatioMode.KeepAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+        QPixmapCache.insert(key, pix)
+        return pix
+
+    def _load_async(self, item):
+        fid = item['id']
+        if (fid, self.thumb_size) in self._loading: return
+        self._loading.add((fid, self.thumb_size))
+        loader = DbThumbnailLoader(self.db, fid, item['path'], self.thumb_size, item.get('thumb_blob'))
+        loader.signals.finished.connect(self.on_loaded)
+        self.thread_pool.start(loader)
+
+    def on_loaded(self, fid, size, image):
+        self._loading.discard((fid, size))
+        # 読み込み中にサイズが変わった場合は、古いサイズの画像を新しいサイズのキーで保存しない
+        if size != self.thumb_size: return
+        for row, item in enumerate(self.items):
+            if item['id'] == fid:
+                item['thumb'] = image
+                idx = self.index(row)
+                self.dataChanged.emit(idx, idx, [_DECO])
+                break
+
+    def extend(self, items):
+        """複数行をまとめて追加（行挿入の通知は1回）"""
+        if not items: return
+        row = len(self.items)
+        self.beginInsertRows(QModelIndex(), row, row + len(items) - 1)
+        self.items.extend(items)
+        self.endInsertRows()
+
+    def remove_rows(self, first, last):
+        """first〜last行（両端含む）をまとめて削除"""
+        self.beginRemoveRows(QModelIndex(), first, last)
+        for item in self.items[first:last + 1]:
+            QPixmapCache.remove(thumbnail_cache_key(item['id'], self.thumb_size))
+        del self.items[first:last + 1]
+        self.endRemoveRows()
+
+    def set_thumb_size(self, size):
+        """アイコンの表示サイズに合わせてサムネイルを作り直す（描画時に拡大縮小させない）"""
+        if size == self.thumb_size: return
+        self.thumb_size = size
+        if self.items:
+            self.dataChanged.emit(self.index(0), self.index(len(self.items) - 1), [_DECO])
+
+    def set_show_path(self, show):
+        if show == self.show_path: return
+        self.show_path = show
+        if self.items:
+            self.dataChanged.emit(self.index(0), self.index(len(self.items) - 1), [_DISPLAY])
+
+    def clear(self):
+        self.beginResetModel()
+        self.items = []
+        self._loading.clear()
+        self.endResetModel()
@@ -1,63 +1,29 @@
+import os
 import time
 import traceback
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QThread, QObject, QRunnable, pyqtSignal
 
 class AppLoader(QThread):
     progress = pyqtSignal(str, int)
-    finished = pyqtSignal(object) # Return loaded modules/objects if needed
-    
-    # Store loaded objects to pass back to main
-    loaded_objects = {}
+    finished = pyqtSignal(object) # Loaded modules (already registered in sys.modules)
 
     def run(self):
         try:
-            self.progress.emit("Loading PyTorch...", 10)
-            import torch
-            self.loaded_objects['torch'] = torch
-            
+            # torch と各機能ページは初回利用時に遅延インポートする (起動高速化のため)
+            # ここではモジュールを読み込むだけで、クラスはMainWindow生成時に取り出す
             self.progress.emit("Loading Core System...", 30)
-            from core import ScannerThread, AnalyzerThread, ImageLoader, setup_logging
-            from database import DatabaseManager
-            from config import config
-            
-            self.loaded_objects['DatabaseManager'] = DatabaseManager
-            self.loaded_objects['ScannerThread'] = ScannerThread
-            self.loaded_objects['AnalyzerThread'] = AnalyzerThread
-            self.loaded_objects['ImageLoader'] = ImageLoader
-            self.loaded_objects['setup_logging'] = setup_logging
-            self.loaded_objects['config'] = config
-            
-            setup_logging()
-            
-            self.progress.emit("Loading UI Modules (1/5)...", 50)
-            from modules.duplicate_ui import DuplicatePage
-            self.loaded_objects['DuplicatePage'] = DuplicatePage
-            
-            self.progress.emit("Loading UI Modules (2/5)...", 60)
-            from modules.blur_ui import BlurPage
-            self.loaded_objects['BlurPage'] = BlurPage
-            
-            from modules.similarity_ui import SimilarityPage
-            self.loaded_objects['SimilarityPage'] = SimilarityPage
-            
-            self.progress.emit("Loading UI Modules (3/5)...", 70)
-            from modules.sorter_ui import SorterPage
-            self.loaded_objects['SorterPage'] = SorterPage
-            
-            self.progress.emit("Loading UI Modules (4/5)...", 80)
-            from modules.clustering_ui import ClusteringPage
-            self.loaded_objects['ClusteringPage'] = ClusteringPage
-            
-            self.progress.emit("Loading UI Modules (5/5)...", 90)
-            from modules.manual_sorter_ui import ManualSorterPage
-            self.loaded_objects['ManualSorterPage'] = ManualSorterPage
-            
-            from modules.small_file_cleaner_ui import SmallFileCleanerPage
-            self.loaded_objects['SmallFileCleanerPage'] = SmallFileCleanerPage
+            import core
+            import database
+            import config
+
+            core.setup_logging()
+
+            self.progress.emit("Pruning Thumbnail Cache...", 60)
+            core.prune_thumbnail_disk_cache()
             
             self.progress.emit("Starting...", 100)
             time.sleep(0.5) # Slight delay to show 100%
-            self.finished.emit(self.loaded_objects)
+            self.finished.emit([core, database, config])
             
         except Exception as e:
             print(f"Loading Error: {e}")
@@ -88,3 +54,23 @@ class DBResetWorker(QThread):
         except Exception as e:
             msg = f"初期化エラー: {e}"
         self.finished.emit(msg)
+
+
+class MakeTrashSignals(QObject):
+    done = pyqtSignal(str, str)  # (path, error) 成功時はerrorが空文字
+
+
+class MakeTrashRunnable(QRunnable):
+    """削除フォルダをバックグラウンドで作成（ネットワークドライブでUIが固まるのを防ぐ）"""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.signals = MakeTrashSignals()
+
+    def run(self):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            self.signals.done.emit(self.path, "")
+        except Exception as e:
+            self.signals.done.emit(self.path, str(e))
@@ -4,8 +4,9 @@ import traceback
 import time
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QPushButton, QLabel, QFileDialog,
-                             QStackedWidget, QProgressBar, QListView, QFrame, QMessageBox)
-from PyQt6.QtCore import Qt, QSize, QTimer
+                             QStackedWidget, QProgressBar, QListView, QAbstractItemView, QFrame,
+                             QMessageBox)
+from PyQt6.QtCore import Qt, QSize, QTimer, QThreadPool
 
 # --- クラッシュ対策 ---
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
@@ -15,31 +16,19 @@ sys.stdout.reconfigure(encoding='utf-8')
 
 # GUI Components
 from gui.splash import SplashScreen
-from gui.workers import AppLoader, DBResetWorker
+from gui.workers import AppLoader, DBResetWorker, MakeTrashRunnable
 from gui.models import PhotoModel
 
-# Global placeholders for lazy loaded modules
-# These will be populated by AppLoader
-DatabaseManager = None
-ScannerThread = None
-AnalyzerThread = None
-ImageLoader = None
-setup_logging = None
-config = None
-DuplicatePage = None
-BlurPage = None
-SimilarityPage = None
-SorterPage = None
-ClusteringPage = None
-ManualSorterPage = None
-SmallFileCleanerPage = None
-
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, DatabaseManager, ScannerThread, AnalyzerThread, config):
         super().__init__()
+        # AppLoaderが読み込み済みのクラス・設定を受け取る
+        self.ScannerThread = ScannerThread
+        self.AnalyzerThread = AnalyzerThread
+        self.config = config
         self.setWindowTitle("PhotoSortX - AI Edition (v2.2)")
-        width, height = config.DEFAULT_WINDOW_SIZE
+        width, height = self.config.DEFAULT_WINDOW_SIZE
         self.resize(width, height)
         self.setStyleSheet("""
             QMainWindow { background-color: #2b2b2b; }
@@ -50,12 +39,23 @@ class MainWindow(QMainWindow):
             QLabel.sidebar-header {
                 color: #888; font-weight: bold; font-size: 12px; margin-top: 15px; margin-bottom: 5px; padding-left: 10px;
             }
+            QFrame#sidebar { background-color: #1e1e1e; border-right: 1px solid #333; }
+            QPushButton[class="sidebar"] { background-color: transparent; border: none; padding: 10px 15px; text-align: left; font-size: 14px; border-radius: 5px; }
+            QPushButton[class="sidebar"]:hover { background-color: #333; }
+            QPushButton[class="sidebar"]:pressed { background-color: #007acc; color: white; }
+            QPushButton[class="danger"] { background-color: #3a1e1e; color: #ff6666; border: 1px solid #552222; border-radius: 4px; padding: 8px; margin-top: 5px; }
+            QPushButton[class="danger"]:hover { background-color: #552222; }
         """)
 
+        # サムネイルのデコードは全ページでグローバルなスレッドプールを共有する
+        QThreadPool.globalInstance().setMaxThreadCount(self.config.DECODE_THREAD_COUNT)
+
         self.db = DatabaseManager()
         self.scanner = None
         self.analyzer = None
         self.reset_worker = None
+        self._lib_summary = None  # (ファイル数, スキャン対象フォルダ, 削除フォルダ) のキャッシュ
+        self._trash_job_signals = set()  # 実行中の削除フォルダ作成ジョブのシグナル（完了通知まで参照を保持）
 
         container = QWidget()
         self.setCentralWidget(container)
@@ -64,31 +64,26 @@ class MainWindow(QMainWindow):
         main_layout.setSpacing(0)
 
         # --- Sidebar ---
+        # スタイルはウィンドウのスタイルシートで一括指定（ボタンはclassプロパティで選択）
         sidebar = QFrame()
-        sidebar.setFixedWidth(config.SIDEBAR_WIDTH)
-        sidebar.setStyleSheet("background-color: #1e1e1e; border-right: 1px solid #333;")
+        sidebar.setObjectName("sidebar")
+        sidebar.setFixedWidth(self.config.SIDEBAR_WIDTH)
         side_layout = QVBoxLayout(sidebar)
         side_layout.setContentsMargins(5, 10, 5, 10)
         side_layout.setSpacing(2)
 
-        btn_style = """
-            QPushButton { background-color: transparent; border: none; padding: 10px 15px; text-align: left; font-size: 14px; border-radius: 5px; }
-            QPushButton:hover { background-color: #333; }
-            QPushButton:pressed { background-color: #007acc; color: white; }
-        """
-
         # A. MAIN
         lbl_main = QLabel("📂 MAIN")
         lbl_main.setProperty("class", "sidebar-header")
         side_layout.addWidget(lbl_main)
 
         btn_home = QPushButton("🏠  ホーム / 取込")
-        btn_home.setStyleSheet(btn_style)
+        btn_home.setProperty("class", "sidebar")
         btn_home.clicked.connect(lambda: self.stack.setCurrentIndex(0))
         side_layout.addWidget(btn_home)
 
         btn_view = QPushButton("🖼  ギャラリー")
-        btn_view.setStyleSheet(btn_style)
+        btn_view.setProperty("class", "sidebar")
         btn_view.clicked.connect(self.show_gallery)
         side_layout.addWidget(btn_view)
 
@@ -98,17 +93,17 @@ class MainWindow(QMainWindow):
         side_layout.addWidget(lbl_clean)
 
         btn_dup = QPushButton("👯  重複整理")
-        btn_dup.setStyleSheet(btn_style)
+        btn_dup.setProperty("class", "sidebar")
         btn_dup.clicked.connect(self.show_duplicate_page)
         side_layout.addWidget(btn_dup)
 
         btn_blur = QPushButton("🌫  ピンボケ整理")
-        btn_blur.setStyleSheet(btn_style)
+        btn_blur.setProperty("class", "sidebar")
         btn_blur.clicked.connect(self.show_blur_page)
         side_layout.addWidget(btn_blur)
 
         btn_sim = QPushButton("👥  類似整理")
-        btn_sim.setStyleSheet(btn_style)
+        btn_sim.setProperty("class", "sidebar")
         btn_sim.clicked.connect(self.show_similarity_page)
         side_layout.addWidget(btn_sim)
 
@@ -118,22 +113,22 @@ class MainWindow(QMainWindow):
         side_layout.addWidget(lbl_org)
 
         btn_manual = QPushButton("🗂  手動仕分け")
-        btn_manual.setStyleSheet(btn_style)
+        btn_manual.setProperty("class", "sidebar")
         btn_manual.clicked.connect(self.show_manual_sorter_page)
         side_layout.addWidget(btn_manual)
 
         btn_sort = QPushButton("📂  スマート整理 (AI)")
-        btn_sort.setStyleSheet(btn_style)
+        btn_sort.setProperty("class", "sidebar")
         btn_sort.clicked.connect(self.show_sorter_page)
         side_layout.addWidget(btn_sort)
 
         btn_cluster = QPushButton("🧩  自動グルーピング")
-        btn_cluster.setStyleSheet(btn_style)
+        btn_cluster.setProperty("class", "sidebar")
         btn_cluster.clicked.connect(self.show_clustering_page)
         side_layout.addWidget(btn_cluster)
 
         btn_small_cleaner = QPushButton("🗑️  小さいファイル削除")
-        btn_small_cleaner.setStyleSheet(btn_style)
+        btn_small_cleaner.setProperty("class", "sidebar")
         btn_small_cleaner.clicked.connect(self.show_small_file_cleaner_page)
         side_layout.addWidget(btn_small_cleaner)
 
@@ -151,15 +146,12 @@ class MainWindow(QMainWindow):
 
         # 削除フォルダ設定
         self.btn_trash_setting = QPushButton("🗑️ 削除フォルダ設定")
-        self.btn_trash_setting.setStyleSheet(btn_style)
+        self.btn_trash_setting.setProperty("class", "sidebar")
         self.btn_trash_setting.clicked.connect(self.setup_trash_folder)
         side_layout.addWidget(self.btn_trash_setting)
 
         self.btn_reset = QPushButton("⚠️ DB全初期化")
-        self.btn_reset.setStyleSheet("""
-            QPushButton { background-color: #3a1e1e; color: #ff6666; border: 1px solid #552222; border-radius: 4px; padding: 8px; margin-top: 5px;}
-            QPushButton:hover { background-color: #552222; }
-        """)
+        self.btn_reset.setProperty("class", "danger")
         self.btn_reset.clicked.connect(self.reset_db)
         side_layout.addWidget(self.btn_reset)
 
@@ -207,47 +199,45 @@ class MainWindow(QMainWindow):
         self.gallery_view.setViewMode(QListView.ViewMode.IconMode)
         self.gallery_view.setResizeMode(QListView.ResizeMode.Adjust)
         self.gallery_view.setUniformItemSizes(True)
-        grid_w, grid_h = config.GALLERY_GRID_SIZE
-        icon_w, icon_h = config.GALLERY_ICON_SIZE
+        # 大量の写真でもUIが固まらないよう、レイアウトはイベントループ上で少しずつ行う
+        self.gallery_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.gallery_view.setBatchSize(self.config.GALLERY_LAYOUT_BATCH_SIZE)
+        self.gallery_view.setMovement(QListView.Movement.Static)
+        self.gallery_view.setHorizontalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.gallery_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        grid_w, grid_h = self.config.GALLERY_GRID_SIZE
+        icon_w, icon_h = self.config.GALLERY_ICON_SIZE
         self.gallery_view.setGridSize(QSize(grid_w, grid_h))
         self.gallery_view.setIconSize(QSize(icon_w, icon_h))
         self.gallery_view.setSpacing(10)
         self.model = PhotoModel(self.db)
         self.gallery_view.setModel(self.model)
+        self.model.set_view(self.gallery_view)
 
         gallery_page = QWidget()
         gallery_layout = QVBoxLayout(gallery_page)
         gallery_layout.addWidget(self.gallery_view)
         self.stack.addWidget(gallery_page)
 
-        # Modules
-        self.duplicate_page = DuplicatePage(self.db)
-        self.blur_page = BlurPage(self.db)
-        self.sim_page = SimilarityPage(self.db)
-        self.manual_sorter_page = ManualSorterPage(self.db)
-        self.sorter_page = SorterPage(self.db)
-        self.clustering_page = ClusteringPage()
-        self.small_file_cleaner_page = SmallFileCleanerPage(self.db)
-
-        self.stack.addWidget(self.duplicate_page)
-        self.stack.addWidget(self.blur_page)
-        self.stack.addWidget(self.sim_page)
-        self.stack.addWidget(self.manual_sorter_page)
-        self.stack.addWidget(self.sorter_page)
-        self.stack.addWidget(self.clustering_page)
-        self.stack.addWidget(self.small_file_cleaner_page)
+        # Modules (起動高速化のため、各ページは初回表示時にインポート・生成する)
+        self._page_cache = {}
 
         main_layout.addWidget(sidebar)
         main_layout.addWidget(self.stack)
 
         self.update_library_info()
-        QTimer.singleShot(500, self.check_startup_sync)
+        QTimer.singleShot(0, self.check_startup_sync)
         QTimer.singleShot(1000, self.check_trash_folder_setup)
 
     # --- Methods ---
+    def library_summary(self):
+        """ライブラリ概要を1クエリで取得し、スキャン・初期化・設定変更まで使い回す"""
+        if self._lib_summary is None:
+            self._lib_summary = self.db.get_library_summary()
+        return self._lib_summary
+
     def update_library_info(self):
-        count = self.db.get_file_count()
-        path = self.db.get_setting("root_path")
+        count, path, _ = self.library_summary()
         if count == 0:
             self.lbl_lib_info.setText("ライブラリ: 未作成\n(スキャンを実行してください)")
         else:
@@ -255,7 +245,7 @@ class MainWindow(QMainWindow):
             self.lbl_lib_info.setText(f"ライブラリ: 作成済み\n枚数: {count} 枚\n場所: .../{folder_name}")
 
     def check_startup_sync(self):
-        root_path = self.db.get_setting("root_path")
+        _, root_path, _ = self.library_summary()
         if root_path and os.path.exists(root_path):
             ans = QMessageBox.question(self, "同期確認",
                                        f"前回スキャンしたフォルダ:\n{root_path}\n\nライブラリと同期（差分更新）しますか？",
@@ -264,11 +254,11 @@ class MainWindow(QMainWindow):
                 self.run_scanner(root_path)
 
     def start_scan(self):
-        last_path = self.db.get_setting("root_path")
+        count, last_path, _ = self.library_summary()
         folder = QFileDialog.getExistingDirectory(self, "スキャンフォルダ選択", last_path if last_path else "")
         if not folder: return
 
-        if self.db.get_file_count() > 0:
+        if count > 0:
             ans = QMessageBox.question(self, "更新確認",
                                        f"ライブラリは既に存在します。\n\n選択したフォルダ: {os.path.basename(folder)}\n\nこのフォルダに対してライブラリを更新（同期）しますか？",
                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
@@ -278,7 +268,7 @@ class MainWindow(QMainWindow):
 
     def run_scanner(self, folder):
         self.lock_buttons(True)
-        self.scanner = ScannerThread(folder, self.db)
+        self.scanner = self.ScannerThread(folder, self.db)
         self.scanner.progress.connect(self.progress_bar.setValue)
         self.scanner.status.connect(self.lbl_status.setText)
         self.scanner.finished.connect(lambda: self.on_finished("スキャン完了！解析を行ってください"))
@@ -286,7 +276,7 @@ class MainWindow(QMainWindow):
 
     def start_analyze(self):
         self.lock_buttons(True)
-        self.analyzer = AnalyzerThread(self.db)
+        self.analyzer = self.AnalyzerThread(self.db)
         self.analyzer.progress.connect(lambda c, t: self.progress_bar.setValue(int(c / t * 100) if t else 0))
         self.analyzer.status.connect(self.lbl_status.setText)
         self.analyzer.finished.connect(lambda: self.on_finished("解析完了"))
@@ -307,12 +297,14 @@ class MainWindow(QMainWindow):
             self.reset_worker.start()
 
     def on_reset_finished(self, msg):
+        self._lib_summary = None
         self.lbl_status.setText(msg)
         self.lock_buttons(False)
         self.update_library_info()
         QMessageBox.information(self, "完了", msg)
 
     def on_finished(self, msg):
+        self._lib_summary = None
         self.lbl_status.setText(msg)
         self.lock_buttons(False)
         self.progress_bar.setValue(100)
@@ -327,39 +319,59 @@ class MainWindow(QMainWindow):
         self.model.reload()
         self.stack.setCurrentIndex(1)
 
+    def _get_page(self, key, factory):
+        """ページを初回のみ生成してスタックに追加し、以後は使い回す"""
+        page = self._page_cache.get(key)
+        if page is None:
+            page = factory(self.db)
+            self.stack.addWidget(page)
+            self._page_cache[key] = page
+        return page
+
     def show_duplicate_page(self):
-        self.duplicate_page.load_data()
-        self.stack.setCurrentWidget(self.duplicate_page)
+        from modules.duplicate_ui import DuplicatePage
+        page = self._get_page('dup', DuplicatePage)
+        page.load_data()
+        self.stack.setCurrentWidget(page)
 
     def show_blur_page(self):
-        self.blur_page.load_data()
-        self.stack.setCurrentWidget(self.blur_page)
+        from modules.blur_ui import BlurPage
+        page = self._get_page('blur', BlurPage)
+        page.load_data()
+        self.stack.setCurrentWidget(page)
 
     def show_similarity_page(self):
-        self.stack.setCurrentWidget(self.sim_page)
+        from modules.similarity_ui import SimilarityPage
+        self.stack.setCurrentWidget(self._get_page('sim', SimilarityPage))
 
     def show_manual_sorter_page(self):
-        self.manual_sorter_page.refresh_source_list()
-        self.stack.setCurrentWidget(self.manual_sorter_page)
+        from modules.manual_sorter_ui import ManualSorterPage
+        page = self._get_page('manual_sorter', ManualSorterPage)
+        page.refresh_source_list()
+        self.stack.setCurrentWidget(page)
 
     def show_sorter_page(self):
-        self.sorter_page.load_images()
-        self.stack.setCurrentWidget(self.sorter_page)
+        from modules.sorter_ui import SorterPage
+        page = self._get_page('sorter', SorterPage)
+        page.load_images()
+        self.stack.setCurrentWidget(page)
 
     def show_clustering_page(self):
-        self.stack.setCurrentWidget(self.clustering_page)
+        from modules.clustering_ui import ClusteringPage
+        self.stack.setCurrentWidget(self._get_page('clustering', ClusteringPage))
 
     def show_small_file_cleaner_page(self):
-        self.stack.setCurrentWidget(self.small_file_cleaner_page)
+        from modules.small_file_cleaner_ui import SmallFileCleanerPage
+        self.stack.setCurrentWidget(self._get_page('small_file_cleaner', SmallFileCleanerPage))
 
     def check_trash_folder_setup(self):
         """
         起動時に削除フォルダが設定されているか確認
         設定されていない場合は、デフォルトフォルダの作成を提案
         """
-        trash_folder = self.db.get_trash_folder()
+        _, _, trash_folder = self.library_summary()
         if not trash_folder:
-            default_trash = config.get_default_trash_folder()
+            default_trash = self.config.get_default_trash_folder()
             
             ans = QMessageBox.question(
                 self, 
@@ -372,27 +384,48 @@ class MainWindow(QMainWindow):
             )
             
             if ans == QMessageBox.StandardButton.Yes:
-                try:
-                    os.makedirs(default_trash, exist_ok=True)
-                    self.db.set_trash_folder(default_trash)
-                    QMessageBox.information(
-                        self, 
-                        "設定完了",
-                        f"削除フォルダを設定しました:\n{default_trash}"
-                    )
-                except Exception as e:
-                    QMessageBox.critical(
-                        self,
-                        "エラー",
-                        f"削除フォルダの作成に失敗しました:\n{e}"
-                    )
+                self.create_trash_folder(default_trash, "削除フォルダを設定しました")
+
+    def create_trash_folder(self, path, done_msg):
+        """
+        削除フォルダをバックグラウンドで作成し、完了後に設定を保存する
+        """
+        self.lbl_status.setText("削除フォルダを作成中...")
+        job = MakeTrashRunnable(path)
+        signals = job.signals
+        signals.done.connect(lambda p, err: self.on_trash_folder_created(p, err, done_msg, signals))
+        self._trash_job_signals.add(signals)
+        # 作成中に別のフォルダを設定して結果が入れ替わらないよう、完了までボタンを無効化
+        self.btn_trash_setting.setEnabled(False)
+        QThreadPool.globalInstance().start(job)
+
+    def on_trash_folder_created(self, path, error, done_msg, signals=None):
+        self._trash_job_signals.discard(signals)
+        if not self._trash_job_signals:
+            self.btn_trash_setting.setEnabled(True)
+            self.lbl_status.setText("")
+        if error:
+            QMessageBox.critical(
+                self,
+                "エラー",
+                f"削除フォルダの作成に失敗しました:\n{error}"
+            )
+            return
+
+        self.db.set_trash_folder(path)
+        self._lib_summary = None
+        QMessageBox.information(
+            self, 
+            "設定完了",
+            f"{done_msg}:\n{path}"
+        )
 
     def setup_trash_folder(self):
         """
         削除フォルダの設定ダイアログ
         """
-        current_trash = self.db.get_trash_folder()
-        default_trash = config.get_default_trash_folder()
+        _, _, current_trash = self.library_summary()
+        default_trash = self.config.get_default_trash_folder()
         
         msg = "削除フォルダを設定してください。\n\n"
         if current_trash:
@@ -419,7 +452,7 @@ class MainWindow(QMainWindow):
             
             if folder:
                 # パス検証
-                if not config.validate_path(folder):
+                if not self.config.validate_path(folder):
                     QMessageBox.warning(
                         self,
                         "エラー",
@@ -427,25 +460,8 @@ class MainWindow(QMainWindow):
                     )
                     return
                 
-                # フォルダが存在しない場合は作成
-                if not os.path.exists(folder):
-                    try:
-                        os.makedirs(folder, exist_ok=True)
-                    except Exception as e:
-                        QMessageBox.critical(
-                            self,
-                            "エラー",
-                            f"フォルダの作成に失敗しました:\n{e}"
-                        )
-                        return
-                
-                # 設定を保存
-                self.db.set_trash_folder(folder)
-                QMessageBox.information(
-                    self,
-                    "設定完了",
-                    f"削除フォルダを設定しました:\n{folder}"
-                )
+                # フォルダが存在しない場合は作成してから設定を保存
+                self.create_trash_folder(folder, "削除フォルダを設定しました")
             else:
                 # キャンセルされた場合、デフォルトを使用するか確認
                 if not current_trash:
@@ -456,22 +472,14 @@ class MainWindow(QMainWindow):
                         QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
                     )
                     if reply2 == QMessageBox.StandardButton.Yes:
-                        try:
-                            os.makedirs(default_trash, exist_ok=True)
-                            self.db.set_trash_folder(default_trash)
-                            QMessageBox.information(
-                                self,
-                                "設定完了",
-                                f"デフォルト削除フォルダを設定しました:\n{default_trash}"
-                            )
-                        except Exception as e:
-                            QMessageBox.critical(
-                                self,
-                                "エラー",
-                                f"削除フォルダの作成に失敗しました:\n{e}"
-                            )
+                        self.create_trash_folder(default_trash, "デフォルト削除フォルダを設定しました")
 
     def closeEvent(self, event):
+        # 実行中のワーカーを先に止めてからDBを閉じる（カーソル使用中のcloseで固まるのを防ぐ）
+        for worker in (self.scanner, self.analyzer):
+            if worker and worker.isRunning():
+                worker.stop()
+                worker.wait(2000)
         self.db.close()
         event.accept()
 
@@ -488,31 +496,15 @@ def main():
     loader = AppLoader()
     loader.progress.connect(splash.show_message)
     
-    def on_loaded(loaded_objects):
-        # Unpack loaded modules to global scope
-        global DatabaseManager, ScannerThread, AnalyzerThread, ImageLoader
-        global setup_logging, config
-        global DuplicatePage, BlurPage, SimilarityPage, SorterPage
-        global ClusteringPage, ManualSorterPage, SmallFileCleanerPage
-        
-        DatabaseManager = loaded_objects.get('DatabaseManager')
-        ScannerThread = loaded_objects.get('ScannerThread')
-        AnalyzerThread = loaded_objects.get('AnalyzerThread')
-        ImageLoader = loaded_objects.get('ImageLoader')
-        setup_logging = loaded_objects.get('setup_logging')
-        config = loaded_objects.get('config')
-        
-        DuplicatePage = loaded_objects.get('DuplicatePage')
-        BlurPage = loaded_objects.get('BlurPage')
-        SimilarityPage = loaded_objects.get('SimilarityPage')
-        SorterPage = loaded_objects.get('SorterPage')
-        ClusteringPage = loaded_objects.get('ClusteringPage')
-        ManualSorterPage = loaded_objects.get('ManualSorterPage')
-        SmallFileCleanerPage = loaded_objects.get('SmallFileCleanerPage')
+    def on_loaded(_modules):
+        # AppLoaderで読み込み済みなので、ここでのインポートはsys.modulesから取るだけ
+        from core import ScannerThread, AnalyzerThread
+        from database import DatabaseManager
+        from config import config
     
         # 3. Show Main Window
         global window
-        window = MainWindow()
+        window = MainWindow(DatabaseManager, ScannerThread, AnalyzerThread, config)
         window.show()
         splash.finish(window)
         
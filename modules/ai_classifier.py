@@ -1,137 +1,559 @@
 import os
+import hashlib
 import logging
-from PyQt6.QtCore import QThread, pyqtSignal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
 
 logger = logging.getLogger(__name__)
 
 # トップレベルではインポートしない (起動高速化のため)
 AI_AVAILABLE = True
 
+# CLIPの入力解像度（デコード時にこのサイズまで縮小しておく）
+CLIP_INPUT_SIZE = 224
+# 画像デコード用スレッド数（PILはデコード中にGILを解放する）
+DECODE_WORKERS = min(8, os.cpu_count() or 4)
+# predict()の要求をまとめる待ち時間（ミリ秒）
+PREDICT_DEBOUNCE_MS = 50
+# イベント判定用ラベル（コンテキスト重視）
+EVENT_LABELS = (
+    "ゴルフ", "バスケットボール", "野球", "サッカー", "テニス",
+    "仕事_書類", "スクリーンショット",
+    "食事_居酒屋", "カフェ_スイーツ", "ラーメン",
+    "旅行_風景", "海_ビーチ", "山_自然", "神社_寺",
+    "街並み", "乗り物", "猫_ペット", "犬_ペット",
+    "集合写真", "屋内_部屋", "日常",
+)
+# イベント判定で読み飛ばす動画の拡張子
+VIDEO_EXTS = frozenset({".mp4", ".mov", ".avi", ".mkv", ".wmv", ".flv", ".webm"})
+# CLIPの正規化パラメータ（CLIPImageProcessorと同じ値）
+CLIP_MEAN = (0.48145466, 0.4578275, 0.40821073)
+CLIP_STD = (0.26862954, 0.26130258, 0.27577711)
+
 
 class AIWorker(QThread):
     # シグナル定義
     model_loaded = pyqtSignal(bool)
-    suggestion_ready = pyqtSignal(list)
+    suggestion_ready = pyqtSignal(str, list)  # (画像パス, [(確信度, フォルダパス), ...]) 読み込めない画像は空リスト
 
     # ★追加: クラスタリング用シグナル (パスリスト, 特徴量テンソル)
     features_ready = pyqtSignal(list, object)
+    # クラスタリング用の進捗通知 (処理済み枚数, 全枚数)
+    progress = pyqtSignal(int, int)
 
-    def __init__(self):
+    def __init__(self, db=None):
         super().__init__()
+        self.db = db  # 画像特徴量キャッシュ用（Noneならキャッシュしない）
         self.ready = False
         self.fns = []  # フォルダパスのリスト（Sorter用）
         self.feats = None  # フォルダのテキスト特徴量（Sorter用）
+        self._last_folders_key = None  # self.featsの元になったフォルダ名のキー
+        self._event_text_feats = None  # EVENT_LABELSのテキスト特徴量（Sorter用）
         self.run_flag = True  # 停止フラグ
+        self._pending_predicts = []  # まとめて推論する画像パス（Sorter用）
+        self._decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS)  # スレッドは必要になるまで生成されない
 
         # 遅延ロードされるライブラリ類
         self.torch = None
+        self.F = None  # torch.nn.functional
         self.Image = None
-        self.proc = None
+        self.tok = None  # テキスト用トークナイザ（Rust実装のFast版）
+        self.img_proc = None  # 画像用プロセッサ（torchvisionが無い場合のみ使用）
         self.mod = None
-
-        print("AIWorker: Initialized (Lazy loading mode) - Preloading libraries on Main Thread...", flush=True)
+        self.device = None
+        self.model_name = None
+        self._vision_compiled = None  # torch.compileした画像エンコーダ（クラスタリングのバッチ推論専用）
+        self._compiled_batch_size = None  # コンパイル時のバッチサイズ（常にこのサイズに揃えて呼ぶ）
+        self._amp_dtype = None  # autocastで使う型（CUDAはFP16、BF16対応CPUはBF16、それ以外は無効）
+        self.vision_session = None  # onnxruntimeのセッション（未使用ならNone）
+        self.text_session = None
+        self.image_tf = None  # torchvisionの前処理（未インストールならimg_procを使用）
+        self._hf_classes = None  # transformersのクラス（インポート成功時のみ）
+        self._load_kwargs = {}  # from_pretrainedに渡す共通引数
+        self._have_local = False  # モデルのスナップショットがローカルキャッシュにあるか
+        self._quantized = False  # PyTorchモデルをINT8に動的量子化したか
+        self._onnx_vision_file = None  # onnxruntimeで使っている画像エンコーダのファイル名
+        self._engine_tag = ""  # 特徴量の値に影響する推論方式（特徴量キャッシュのキーに含める）
+
+        logger.info("AIWorker: Initialized (Lazy loading mode) - Preloading libraries on Main Thread...")
         self._preload_libraries()
     
     def _preload_libraries(self):
         """
         Windowsでのクラッシュ(STATUS_STACK_BUFFER_OVERRUN)を防ぐため、
         重いライブラリのインポートはメインスレッドで行う
+        （モデルの読み込みは時間がかかるため run() 内で行う）
         """
         try:
-            print("AIWorker: Importing torch...", flush=True)
+            logger.debug("AIWorker: Importing torch...")
             import torch
+            import torch.nn.functional as F
             self.torch = torch
+            self.F = F
 
-            print("AIWorker: Importing PIL...", flush=True)
+            logger.debug("AIWorker: Importing PIL...")
             from PIL import Image
             self.Image = Image
 
-            print("AIWorker: Importing transformers...", flush=True)
-            try:
-                from transformers import CLIPProcessor, CLIPModel
-            except Exception as e_tf:
-                print(f"AIWorker: CRITICAL - Failed to import transformers: {e_tf}", flush=True)
-                logger.error(f"Transformers import failed: {e_tf}", exc_info=True)
-                return
-
-            import os
-            
             # 設定をインポート
             from config import config
             
             # Hugging Face接続エラー対策
-            model_name = config.CLIP_MODEL_NAME
+            self.model_name = config.CLIP_MODEL_NAME
             load_kwargs = {}
             
+            # 環境変数はhuggingface_hubのインポート時に読まれるため、transformersより先に設定する
             # オフラインモード設定
             if config.HF_OFFLINE_MODE:
                 os.environ["TRANSFORMERS_OFFLINE"] = "1"
-                load_kwargs["local_files_only"] = True
-                print("AIWorker: Using offline mode (local files only)", flush=True)
+                os.environ["HF_HUB_OFFLINE"] = "1"
+                logger.info("AIWorker: Using offline mode (local files only)")
             
             # ミラーサイト設定
             if config.HF_MIRROR_SITE:
                 os.environ["HF_ENDPOINT"] = config.HF_MIRROR_SITE
-                print(f"AIWorker: Using mirror site: {config.HF_MIRROR_SITE}", flush=True)
+                logger.info("AIWorker: Using mirror site: %s", config.HF_MIRROR_SITE)
             
-            # キャッシュディレクトリ設定
+            # キャッシュディレクトリ設定（共有ディレクトリのキャッシュも使えるよう環境変数にも設定）
             if config.HF_MODEL_CACHE_DIR:
                 cache_dir = config.HF_MODEL_CACHE_DIR
                 os.makedirs(cache_dir, exist_ok=True)
+                os.environ.setdefault("HF_HUB_CACHE", cache_dir)
+                os.environ.setdefault("TRANSFORMERS_CACHE", cache_dir)
                 load_kwargs["cache_dir"] = cache_dir
-                print(f"AIWorker: Using cache directory: {cache_dir}", flush=True)
+                logger.info("AIWorker: Using cache directory: %s", cache_dir)
+            self._load_kwargs = load_kwargs
+
+            logger.debug("AIWorker: Importing transformers...")
+            try:
+                from transformers import CLIPImageProcessor, CLIPTokenizerFast, CLIPModel
+            except Exception as e_tf:
+                logger.error("AIWorker: CRITICAL - Failed to import transformers: %s", e_tf, exc_info=True)
+                return
+            self._hf_classes = (CLIPImageProcessor, CLIPTokenizerFast, CLIPModel)
+            
+        except ImportError as e:
+            logger.error("AIWorker: Library missing: %s", e)
+        except Exception as e:
+            logger.error("AIWorker: CRASHED during import: %s", e, exc_info=True)
 
-            print("AIWorker: Loading CLIPProcessor (This is heavy)...", flush=True)
+    def _load_model(self):
+        """
+        CLIPのトークナイザ・モデルを読み込み、推論の準備をする（run() から呼ばれる）
+        """
+        if self._hf_classes is None:
+            return
+        CLIPImageProcessor, CLIPTokenizerFast, CLIPModel = self._hf_classes
+        torch = self.torch
+        try:
+            from config import config
+            model_name = self.model_name
+            load_kwargs = self._load_kwargs
+            self._have_local = self._has_local_snapshot(model_name, load_kwargs.get("cache_dir"))
+
+            logger.info("AIWorker: Loading CLIPTokenizerFast...")
+            self.tok = self._from_pretrained(CLIPTokenizerFast, model_name, load_kwargs)
+
+            logger.info("AIWorker: Loading CLIPModel (This is heavy)...")
+            # 重みはsafetensors形式（mmapで高速に読める）を使う
+            # オフラインモードでは既存キャッシュ（旧形式の場合あり）をそのまま使う
+            model_kwargs = dict(load_kwargs)
+            if not config.HF_OFFLINE_MODE:
+                model_kwargs["use_safetensors"] = True
+            self.mod = self._from_pretrained(CLIPModel, model_name, model_kwargs)
+
+            # GPUがあれば推論はGPUで行う（CUDAではFP16 autocastを推論時に適用）
+            if torch.cuda.is_available():
+                self.device = torch.device("cuda")
+            elif getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+                self.device = torch.device("mps")  # Apple Silicon
+            else:
+                self.device = torch.device("cpu")
+            self.mod = self.mod.to(self.device).eval()
+            logger.info("AIWorker: Using device: %s", self.device)
+
+            # onnxruntimeがあればONNXに書き出したモデルで推論する（PyTorchの量子化・コンパイルは不要）
+            if config.AI_ONNX_RUNTIME:
+                self._init_onnx(config.HF_MODEL_CACHE_DIR or config.CACHE_DIR)
+
+            if self.device.type == "cuda":
+                self._amp_dtype = torch.float16
+
+            if self.vision_session is None:
+                if self.device.type == "cpu" and config.AI_CPU_BF16 and self._cpu_supports_bf16():
+                    # BF16命令のあるCPUではINT8量子化よりBF16 autocastを優先する
+                    self._amp_dtype = torch.bfloat16
+                    logger.info("AIWorker: Using bfloat16 autocast on CPU")
+                # CPUのみの環境ではLinear層をINT8に動的量子化する
+                elif self.device.type == "cpu" and config.AI_QUANTIZE:
+                    self._quantize_model()
+
+                # コンパイルはCUDAで、バッチサイズを揃えられるクラスタリングの推論にのみ使う
+                if config.AI_TORCH_COMPILE and self.device.type == "cuda":
+                    self._compile_vision_model()
+
+            # 画像の前処理はtorchvisionで行う（CLIPImageProcessorより高速）
+            try:
+                from torchvision import transforms
+                self.image_tf = transforms.Compose([
+                    transforms.Resize(CLIP_INPUT_SIZE, interpolation=transforms.InterpolationMode.BICUBIC),
+                    transforms.CenterCrop(CLIP_INPUT_SIZE),
+                    transforms.ToTensor(),
+                    transforms.Normalize(CLIP_MEAN, CLIP_STD),
+                ])
+            except ImportError:
+                logger.info("AIWorker: torchvision not found, using CLIPImageProcessor for images.")
+                self.img_proc = self._from_pretrained(CLIPImageProcessor, model_name, load_kwargs)
+
+            self._warmup()
+            self._engine_tag = self._make_engine_tag()
+
+            logger.info("AIWorker: Model Loaded Successfully!")
+            self.ready = True
+            self._restore_last_folder_features()
+            try:
+                self._encode_event_labels()
+            except Exception as e:
+                logger.warning("AIWorker: Failed to encode event labels: %s", e)
             
-            # 1. Try Offline (Processor)
+        except Exception as e:
+            logger.error("AIWorker: CRASHED during load: %s", e, exc_info=True)
+
+    def _has_local_snapshot(self, model_name, cache_dir=None):
+        """Hugging Faceのキャッシュにモデルのスナップショットがあるか（ファイルの有無だけを見る）"""
+        if cache_dir is None:
             try:
-                self.proc = CLIPProcessor.from_pretrained(model_name, local_files_only=True, **load_kwargs)
-                print("AIWorker: CLIPProcessor loaded from local cache.", flush=True)
-            except Exception as e_local:
-                if config.HF_OFFLINE_MODE:
-                    print(f"AIWorker: Failed to load Processor locally and Offline Mode is ON: {e_local}", flush=True)
-                    raise e_local
-                
-                print(f"AIWorker: Local load failed, trying online... ({e_local})", flush=True)
-                # 2. Try Online (Processor)
-                try:
-                    self.proc = CLIPProcessor.from_pretrained(model_name, **load_kwargs)
-                except Exception as e_online:
-                    logger.error(f"Failed to load CLIPProcessor (Online): {e_online}", exc_info=True)
-                    raise e_online
-
-            print("AIWorker: Loading CLIPModel (This is also heavy)...", flush=True)
-            # 1. Try Offline (Model)
+                from huggingface_hub.constants import HF_HUB_CACHE
+                cache_dir = HF_HUB_CACHE
+            except ImportError:
+                return False
+        snap = os.path.join(cache_dir, "models--" + model_name.replace("/", "--"), "snapshots")
+        try:
+            return bool(os.listdir(snap))
+        except OSError:
+            return False
+
+    def _from_pretrained(self, cls, model_name, load_kwargs):
+        """
+        キャッシュがあればローカルから、無ければ（オフラインモードでなければ）オンラインから取得
+
+        失敗が分かっている読み込みを例外で試さないよう、キャッシュの有無で最初の経路を決める。
+        """
+        from config import config
+        # 1. Try Offline
+        if self._have_local or config.HF_OFFLINE_MODE:
             try:
-                self.mod = CLIPModel.from_pretrained(model_name, local_files_only=True, **load_kwargs)
-                print("AIWorker: CLIPModel loaded from local cache.", flush=True)
+                obj = cls.from_pretrained(model_name, local_files_only=True, **load_kwargs)
+                logger.info("AIWorker: %s loaded from local cache.", cls.__name__)
+                return obj
             except Exception as e_local:
                 if config.HF_OFFLINE_MODE:
-                    print(f"AIWorker: Failed to load Model locally and Offline Mode is ON: {e_local}", flush=True)
+                    logger.error("AIWorker: Failed to load %s locally and Offline Mode is ON: %s", cls.__name__, e_local)
                     raise e_local
-                
-                print(f"AIWorker: Local load failed, trying online... ({e_local})", flush=True)
-                # 2. Try Online (Model)
-                try:
-                    self.mod = CLIPModel.from_pretrained(model_name, **load_kwargs)
-                except Exception as e_online:
-                    logger.error(f"Failed to load CLIPModel (Online): {e_online}", exc_info=True)
-                    raise e_online
-
-            print("AIWorker: Model Loaded Successfully!", flush=True)
-            self.ready = True
-            
-        except ImportError as e:
-            print(f"AIWorker: Library missing: {e}", flush=True)
-            logger.error(f"AI Library Import Error: {e}")
+
+                logger.warning("AIWorker: Local load failed, trying online... (%s)", e_local)
+        # 2. Try Online
+        try:
+            return cls.from_pretrained(model_name, **load_kwargs)
+        except Exception as e_online:
+            logger.error(f"Failed to load {cls.__name__} (Online): {e_online}", exc_info=True)
+            raise e_online
+
+    def _init_onnx(self, cache_dir):
+        """
+        CLIPの画像・テキストエンコーダをONNXに書き出し（初回のみ）、onnxruntimeで読み込む
+        
+        onnxruntimeが無い場合や書き出しに失敗した場合はPyTorchのまま推論する。
+        """
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            return
+
+        torch = self.torch
+        slug = self.model_name.replace("/", "--")
+        vision_path = os.path.join(cache_dir, f"clip_vision_{slug}.onnx")
+        text_path = os.path.join(cache_dir, f"clip_text_{slug}.onnx")
+        mod = self.mod
+
+        class ImageEncoder(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.mod = mod
+
+            def forward(self, pixel_values):
+                return self.mod.get_image_features(pixel_values=pixel_values)
+
+        class TextEncoder(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.mod = mod
+
+            def forward(self, input_ids, attention_mask):
+                return self.mod.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            if not os.path.exists(vision_path):
+                logger.info("AIWorker: Exporting vision model to ONNX (first run only)...")
+                dummy = torch.zeros(1, 3, CLIP_INPUT_SIZE, CLIP_INPUT_SIZE, device=self.device)
+                torch.onnx.export(ImageEncoder().eval(), (dummy,), vision_path + ".tmp",
+                                  input_names=["pixel_values"], output_names=["image_embeds"],
+                                  dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+                                  opset_version=17)
+                os.replace(vision_path + ".tmp", vision_path)  # 書きかけのファイルを残さない
+            if not os.path.exists(text_path):
+                logger.info("AIWorker: Exporting text model to ONNX (first run only)...")
+                ids = torch.zeros(1, 8, dtype=torch.long, device=self.device)
+                mask = torch.ones(1, 8, dtype=torch.long, device=self.device)
+                torch.onnx.export(TextEncoder().eval(), (ids, mask), text_path + ".tmp",
+                                  input_names=["input_ids", "attention_mask"], output_names=["text_embeds"],
+                                  dynamic_axes={"input_ids": {0: "batch", 1: "seq"},
+                                                "attention_mask": {0: "batch", 1: "seq"},
+                                                "text_embeds": {0: "batch"}},
+                                  opset_version=17)
+                os.replace(text_path + ".tmp", text_path)
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = os.cpu_count() or 0
+            providers = ["CPUExecutionProvider"]
+            if self.device.type == "cuda" and "CUDAExecutionProvider" in ort.get_available_providers():
+                providers.insert(0, "CUDAExecutionProvider")
+
+            # CPU推論ではONNXモデルもINT8に動的量子化したものを使う（初回のみ作成）
+            from config import config
+            if providers[0] == "CPUExecutionProvider" and config.AI_QUANTIZE:
+                vision_path = self._quantize_onnx(vision_path)
+                text_path = self._quantize_onnx(text_path)
+
+            self.vision_session = ort.InferenceSession(vision_path, options, providers=providers)
+            self._onnx_vision_file = f"{os.path.basename(vision_path)}@{providers[0]}"
+            self.text_session = ort.InferenceSession(text_path, options, providers=providers)
+            logger.info("AIWorker: Using ONNX Runtime (%s)", providers[0])
+        except Exception as e:
+            self.vision_session = None
+            self.text_session = None
+            self._onnx_vision_file = None
+            logger.warning("AIWorker: ONNX Runtime unavailable, using PyTorch: %s", e)
+
+    def _quantize_onnx(self, path):
+        """ONNXモデルのLinear層（MatMul）をINT8へ動的量子化したファイルを返す（失敗時は元のファイル）"""
+        int8_path = path[:-len(".onnx")] + ".int8.onnx"
+        if os.path.exists(int8_path):
+            return int8_path
+        try:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            logger.info("AIWorker: Quantizing %s to INT8 (first run only)...", os.path.basename(path))
+            quantize_dynamic(path, int8_path + ".tmp", weight_type=QuantType.QInt8)
+            os.replace(int8_path + ".tmp", int8_path)
+            return int8_path
+        except Exception as e:
+            logger.warning("AIWorker: ONNX quantization skipped, using FP32: %s", e)
+            return path
+
+    def _run_session(self, session, inputs):
+        """onnxruntimeで推論し、結果を推論デバイス上のテンソルで返す"""
+        names = {i.name for i in session.get_inputs()}
+        feed = {k: v.cpu().numpy() for k, v in inputs.items() if k in names}
+        return self.torch.from_numpy(session.run(None, feed)[0]).to(self.device)
+
+    def _image_features(self, inputs):
+        """画像特徴量を計算（ONNXセッションがあればそちらを使う）"""
+        if self.vision_session is not None:
+            return self._run_session(self.vision_session, inputs)
+        return self.mod.get_image_features(**inputs)
+
+    def _text_features(self, inputs):
+        """テキスト特徴量を計算（ONNXセッションがあればそちらを使う）"""
+        if self.text_session is not None:
+            return self._run_session(self.text_session, inputs)
+        return self.mod.get_text_features(**inputs)
+
+    def _quantize_model(self):
+        """CPU推論用にLinear層をINT8へ動的量子化（失敗時はFP32のまま）"""
+        torch = self.torch
+        try:
+            engines = torch.backends.quantized.supported_engines
+            for engine in ("onednn", "x86", "fbgemm", "qnnpack"):
+                if engine in engines:
+                    torch.backends.quantized.engine = engine
+                    break
+            self.mod = torch.ao.quantization.quantize_dynamic(self.mod, {torch.nn.Linear}, dtype=torch.qint8)
+            self._quantized = True
+            logger.info("AIWorker: Model quantized to INT8 (engine: %s)", torch.backends.quantized.engine)
+        except Exception as e:
+            logger.warning("AIWorker: Quantization skipped, using FP32: %s", e)
+
+    def _clustering_batch_size(self):
+        """クラスタリング時のバッチサイズ（GPUでは空きメモリに応じて増やす）"""
+        from config import config
+        batch_size = config.BATCH_SIZE_CLUSTERING
+        if self.device.type == "cuda" and self.vision_session is None:
+            try:
+                free, _ = self.torch.cuda.mem_get_info(self.device)
+                fit = int(free * 0.5) // config.CLUSTERING_BYTES_PER_IMAGE
+                batch_size = max(batch_size, min(fit, config.MAX_BATCH_SIZE_CLUSTERING))
+            except Exception as e:
+                logger.debug("AIWorker: Could not query GPU memory: %s", e)
+        return batch_size
+
+    def _compile_vision_model(self):
+        """
+        画像エンコーダをtorch.compileし、クラスタリングで使うバッチサイズのダミー入力で事前にコンパイルする
+
+        元のモデルは置き換えず、コンパイル版は _clustering_image_features からのみ使う
+        （Sorter・イベント推定はバッチサイズが毎回変わるため、再コンパイルを避けて通常の推論を使う）。
+        失敗した場合はコンパイルせずに通常の推論を使う。
+        """
+        torch = self.torch
+        if not hasattr(torch, "compile"):
+            return
+        try:
+            logger.info("AIWorker: Compiling vision model (torch.compile)...")
+            compiled = torch.compile(self.mod.vision_model)
+            batch_size = self._clustering_batch_size()
+            dummy = torch.zeros(batch_size, 3, CLIP_INPUT_SIZE, CLIP_INPUT_SIZE, device=self.device)
+            with torch.inference_mode():
+                with self._autocast():
+                    compiled(pixel_values=dummy)
+            self._vision_compiled = compiled
+            self._compiled_batch_size = batch_size
+            logger.info("AIWorker: Vision model compiled (batch size %d).", batch_size)
+        except Exception as e:
+            # Windowsや古いtorchではコンパイラが使えないことがある
+            logger.warning("AIWorker: torch.compile unavailable, using eager mode: %s", e)
+
+    def _clustering_image_features(self, inputs):
+        """クラスタリング用の画像特徴量（コンパイル済みならそちらを使い、失敗したら通常の推論に戻す）"""
+        if self._vision_compiled is not None:
+            try:
+                pooled = self._vision_compiled(pixel_values=inputs["pixel_values"])[1]
+                return self.mod.visual_projection(pooled)
+            except Exception as e:
+                logger.warning("AIWorker: Compiled vision model failed, using eager mode: %s", e)
+                self._vision_compiled = None
+        return self._image_features(inputs)
+
+    def _warmup(self):
+        """ダミー入力で画像・テキスト両方の推論を1回ずつ実行し、初回クリック時の遅延を無くす"""
+        torch = self.torch
+        try:
+            pixels = torch.zeros(1, 3, CLIP_INPUT_SIZE, CLIP_INPUT_SIZE, dtype=torch.float32, device=self.device)
+            ids = torch.zeros(1, 5, dtype=torch.long, device=self.device)
+            mask = torch.ones(1, 5, dtype=torch.long, device=self.device)
+            with torch.inference_mode():
+                with self._autocast():
+                    self._image_features({"pixel_values": pixels})
+                    self._text_features({"input_ids": ids, "attention_mask": mask})
         except Exception as e:
-            print(f"AIWorker: CRASHED during load: {e}", flush=True)
-            logger.error(f"AI Model Load Error: {e}", exc_info=True)
+            # ウォームアップの失敗は致命的ではない
+            logger.warning("AIWorker: Warm-up failed: %s", e)
+
+    def _to_device(self, inputs):
+        """プロセッサ出力のテンソルを推論デバイスへ転送"""
+        return {k: v.to(self.device, non_blocking=True) for k, v in inputs.items()}
+
+    def _image_inputs(self, images):
+        """画像（PILまたは前処理済みテンソル）のリストをモデル入力に変換"""
+        if self.image_tf is not None:
+            pixels = self.torch.stack([im if self.torch.is_tensor(im) else self.image_tf(im) for im in images])
+            return {"pixel_values": pixels.to(self.device, non_blocking=True)}
+        return self._to_device(self.img_proc(images=images, return_tensors="pt"))
+
+    def _cpu_supports_bf16(self):
+        """CPUがBF16演算命令（AVX512-BF16 / AMX）を持つか"""
+        cpu = getattr(self.torch, "cpu", None)
+        for name in ("_is_avx512_bf16_supported", "_is_amx_tile_supported"):
+            check = getattr(cpu, name, None)
+            try:
+                if check is not None and check():
+                    return True
+            except Exception:
+                pass
+        return False
+
+    def _autocast(self):
+        """CUDAではFP16、BF16対応CPUではBF16のautocastを有効にするコンテキスト（出力は呼び出し側でFP32に戻す）"""
+        return self.torch.autocast(device_type=self.device.type, dtype=self._amp_dtype or self.torch.float16,
+                                   enabled=self._amp_dtype is not None)
+
+    def _make_engine_tag(self):
+        """
+        特徴量の値を左右する推論方式（実行エンジン・精度・量子化・前処理）を表す文字列
+
+        方式が違うと同じ画像でも特徴量がわずかにずれるため、キャッシュを混ぜないようキーに含める。
+        """
+        if self.vision_session is not None:
+            engine = f"onnx:{self._onnx_vision_file}"
+        else:
+            dtype = str(self._amp_dtype).replace("torch.", "") if self._amp_dtype is not None else "fp32"
+            engine = f"torch:{self.device.type}:{dtype}:{'int8' if self._quantized else 'float'}"
+        preprocess = "torchvision" if self.image_tf is not None else "clip_processor"
+        return f"{engine}|{preprocess}"
+
+    def _feature_key(self, path):
+        """特徴量キャッシュのキー（モデル名・推論方式・パス・サイズ・更新日時から生成）"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        raw = f"{self.model_name}|{self._engine_tag}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _load_cached_features(self, keys):
+        """DBから特徴量を取得し {キー: FP16のバイト列} で返す"""
+        if self.db is None:
+            return {}
+        return self.db.get_clip_features([k for k in keys if k])
+
+    def _save_cached_features(self, keys, features):
+        """新しく計算した特徴量をFP16のバイト列としてDBに保存"""
+        if self.db is None:
+            return
+        vecs = features.half().cpu().numpy()
+        rows = [(k, vecs.shape[1], vecs[i].tobytes()) for i, k in enumerate(keys) if k]
+        self.db.save_clip_features(rows)
+
+    def _open_rgb(self, path):
+        """画像をRGBで開く（JPEGはCLIP入力解像度に近い縮尺でデコードする）"""
+        img = self.Image.open(path)
+        img.draft('RGB', (CLIP_INPUT_SIZE, CLIP_INPUT_SIZE))
+        return img.convert('RGB')
+
+    def _open_scaled(self, path):
+        """画像をRGBで開き、短辺がCLIP_INPUT_SIZEより大きければそこまで縮小する"""
+        img = self._open_rgb(path)
+        w, h = img.size
+        scale = CLIP_INPUT_SIZE / min(w, h)
+        if scale < 1:
+            # アスペクト比は保持（中央切り抜きは前処理側で行う）
+            img = img.resize((max(CLIP_INPUT_SIZE, round(w * scale)), max(CLIP_INPUT_SIZE, round(h * scale))),
+                             self.Image.BILINEAR)
+        return img
+
+    def _decode_many(self, paths):
+        """複数の画像を並列にRGBで開いて縮小する（読み込めなかったものはNone）"""
+        def safe_open(path):
+            try:
+                return self._open_scaled(path)
+            except Exception as e:
+                logger.debug("AIWorker: Skip invalid image %s: %s", os.path.basename(path), e)
+                return None
+        return list(self._decode_pool.map(safe_open, paths))
+
+    def _load_clip_image(self, path):
+        """CLIP入力用に画像を読み込み、短辺をCLIP_INPUT_SIZEまで縮小して前処理（デコード用スレッドで実行）"""
+        img = self._open_scaled(path)
+        if self.image_tf is not None:
+            return self.image_tf(img)  # 前処理もデコード用スレッドで済ませる
+        return img
 
     def stop(self):
         """処理を停止"""
         self.run_flag = False
-        print("AIWorker: Stop requested", flush=True)
+        logger.debug("AIWorker: Stop requested")
     
     def reset_stop_flag(self):
         """停止フラグをリセット（新しい処理開始時）"""
@@ -139,145 +561,325 @@ class AIWorker(QThread):
 
     def run(self):
         """
-        スレッド本体。今は軽い処理のみ。
+        スレッド本体。モデルの読み込み（ダウンロード含む）をUIスレッドの外で行う。
         """
-        if self.ready:
-            self.model_loaded.emit(True)
-        else:
-            self.model_loaded.emit(False)
+        if not self.ready:
+            self._load_model()
+        self.model_loaded.emit(self.ready)
 
     def set_target_folders(self, paths):
         """
         Sorter機能用: フォルダ名をAIに学習(ベクトル化)させる
+        
+        同じフォルダ名の組み合わせはメモリ/ディスク上のキャッシュを再利用する。
         """
         if not self.ready or not paths:
-            print("AIWorker: Not ready or no paths for set_target_folders", flush=True)
+            logger.debug("AIWorker: Not ready or no paths for set_target_folders")
             return
 
         self.fns = paths
         labels = [os.path.basename(p) for p in paths]
+        key = self._folders_key(labels)
+        if key == self._last_folders_key:
+            logger.debug("AIWorker: Folder set unchanged, reusing features.")
+            return
+
+        cache_path = self._folder_feats_path(key)
         try:
-            print(f"AIWorker: Vectorizing {len(labels)} folder names...", flush=True)
-            inp = self.proc(text=labels, return_tensors="pt", padding=True)
+            if os.path.exists(cache_path):
+                self.feats = self._prepare_folder_feats(self.torch.load(cache_path, map_location="cpu", weights_only=True)["feats"])
+                self._last_folders_key = key
+                logger.debug("AIWorker: Folder features loaded from %s", cache_path)
+                return
+        except Exception as e:
+            logger.warning("AIWorker: Failed to load folder features cache %s: %s", cache_path, e)
+
+        try:
+            logger.debug("AIWorker: Vectorizing %d folder names...", len(labels))
+            inp = self._to_device(self.tok(labels, return_tensors="pt", padding=True, truncation=True))
+
+            with self.torch.inference_mode():
+                with self._autocast():
+                    feats = self._text_features(inp)
+                # 正規化はFP32で行う（FP16のままだと精度が落ちる）
+                feats = feats.float()
+                feats = self.F.normalize(feats, dim=-1)
+            self.feats = self._prepare_folder_feats(feats)
+
+            self._last_folders_key = key
+            logger.debug("AIWorker: Folder vectorization complete.")
+        except Exception as e:
+            self._last_folders_key = None
+            logger.error("AIWorker: Folder Vectorization Error %s", e)
+            return
 
-            with self.torch.no_grad():
-                self.feats = self.mod.get_text_features(**inp)
-                self.feats /= self.feats.norm(dim=-1, keepdim=True)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            self.torch.save({"folders": list(paths), "feats": feats.cpu(),
+                             "model_name": str(self.model_name), "key": key}, cache_path)
+        except Exception as e:
+            logger.warning("AIWorker: Failed to save folder features cache %s: %s", cache_path, e)
+
+    def _prepare_folder_feats(self, feats):
+        """フォルダ特徴量を推論デバイス上に置く（GPUではFP16の連続メモリで保持して転送量・容量を半減）"""
+        if self.device.type == "cuda":
+            if feats.device.type == "cpu":
+                feats = feats.contiguous().pin_memory()
+            return feats.to(self.device, dtype=self.torch.float16, non_blocking=True).contiguous()
+        return feats.to(self.device, dtype=self.torch.float32)
+
+    def _folders_key(self, labels):
+        """フォルダ名の組み合わせ・モデル・推論方式からテキスト特徴量キャッシュのキーを生成"""
+        raw = "\n".join([str(self.model_name), self._engine_tag] + labels)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _folder_feats_path(self, key):
+        from config import config
+        return os.path.join(config.CACHE_DIR, f"folder_feats_{key}.pt")
 
-            print("AIWorker: Folder vectorization complete.", flush=True)
+    def _restore_last_folder_features(self):
+        """前回保存したフォルダ特徴量を読み込み、起動直後から推論できるようにする"""
+        from config import config
+        try:
+            files = [os.path.join(config.CACHE_DIR, f) for f in os.listdir(config.CACHE_DIR)
+                     if f.startswith("folder_feats_") and f.endswith(".pt")]
+        except OSError:
+            return
+        if not files:
+            return
+        latest = max(files, key=os.path.getmtime)
+        try:
+            data = self.torch.load(latest, map_location="cpu", weights_only=True)
+            folders = data["folders"]
+            key = self._folders_key([os.path.basename(p) for p in folders])
+            # 別のモデル・推論方式で保存した特徴量は次元や値が合わないため使わない
+            if data.get("model_name") != str(self.model_name) or data.get("key") != key:
+                logger.debug("AIWorker: Skipping folder features saved by another model: %s", latest)
+                return
+            if not all(os.path.isdir(p) for p in folders):
+                return
+            self.fns = folders
+            self.feats = self._prepare_folder_feats(data["feats"])
+            self._last_folders_key = key
+            logger.info("AIWorker: Restored features for %d folders.", len(folders))
         except Exception as e:
-            print(f"AIWorker: Folder Vectorization Error {e}", flush=True)
+            logger.warning("AIWorker: Failed to restore folder features %s: %s", latest, e)
 
     def predict(self, path):
         """
         Sorter機能用: 画像のパスを受け取り、最も近いフォルダを推論する
+        
+        PREDICT_DEBOUNCE_MS以内に届いた要求はまとめて1バッチで推論し、
+        要求順に (パス, 候補) をsuggestion_readyで発行する（読み込めない画像・推論失敗時は候補が空）。
         """
         if not self.ready or not self.fns:
-            print("AIWorker: Predict skipped (Not ready or no folders set)", flush=True)
+            logger.debug("AIWorker: Predict skipped (Not ready or no folders set)")
+            return
+
+        self._pending_predicts.append(path)
+        if len(self._pending_predicts) == 1:
+            QTimer.singleShot(PREDICT_DEBOUNCE_MS, self._flush_predicts)
+
+    def _flush_predicts(self):
+        """溜まった推論要求をまとめて処理"""
+        paths, self._pending_predicts = self._pending_predicts, []
+        if not self.ready or not self.fns:
+            # 推論できない場合も、要求ごとに空の候補を1回ずつ返す
+            for path in paths:
+                self.suggestion_ready.emit(path, [])
+            return
+
+        decoded = self._decode_many(paths)
+        images = [img for img in decoded if img is not None]
+        results = {}  # paths内の位置 -> 候補
+        if not images:
+            for path in paths:
+                self.suggestion_ready.emit(path, [])
             return
 
         try:
-            print(f"AIWorker: Predicting for {os.path.basename(path)}", flush=True)
-            image = self.Image.open(path)
-            inp = self.proc(images=image, return_tensors="pt")
+            logger.debug("AIWorker: Predicting for %d images", len(images))
+            inp = self._image_inputs(images)
 
-            with self.torch.no_grad():
-                img_f = self.mod.get_image_features(**inp)
-                img_f /= img_f.norm(dim=-1, keepdim=True)
+            with self.torch.inference_mode():
+                with self._autocast():
+                    img_f = self._image_features(inp)
+                img_f = img_f.float()
+                img_f = self.F.normalize(img_f, dim=-1)
 
                 # 類似度計算 (画像 vs フォルダテキスト)
-                sim = (100.0 * img_f @ self.feats.T).softmax(dim=-1)
-                values, indices = sim[0].topk(3)
+                # 順位付けにsoftmaxは不要なので、上位3件を選んでからその中だけで確信度を出す
+                scores = img_f.to(self.feats.dtype) @ self.feats.T
+                values, indices = scores.topk(min(3, len(self.fns)), dim=-1)
+                probs = self.torch.softmax(values.float() * 100.0, dim=-1)
 
-            sugs = [(values[j].item(), self.fns[indices[j]]) for j in range(len(values))]
-            print(f"AIWorker: Suggestion -> {sugs[0][1]} ({sugs[0][0]:.2f})", flush=True)
-            self.suggestion_ready.emit(sugs)
+            rows = [i for i, img in enumerate(decoded) if img is not None]
+            for i, row_values, row_indices in zip(rows, probs.tolist(), indices.tolist()):
+                sugs = [(v, self.fns[j]) for v, j in zip(row_values, row_indices)]
+                logger.debug("AIWorker: Suggestion -> %s (%.2f)", sugs[0][1], sugs[0][0])
+                results[i] = sugs
 
         except Exception as e:
-            print(f"AIWorker: Prediction Error {e}", flush=True)
+            logger.error("AIWorker: Prediction Error %s", e)
+
+        # 要求順に、どの画像への候補かが分かる形で通知する
+        for i, path in enumerate(paths):
+            self.suggestion_ready.emit(path, results.get(i, []))
 
     # ★追加機能: クラスタリング画面(ClusteringPage)用
     def vectorize_images(self, paths):
         """
         指定された画像リストを一括でベクトル化し、features_readyシグナルで返す
+        
+        バッチごとにprogressシグナルで進捗を通知する。途中で停止された場合は、
+        それまでに得られた特徴量だけをfeatures_readyで返す。
+        シグナルと同じ (パスのリスト, 特徴量) を戻り値としても返すので、
+        ワーカースレッドから呼び出して結果をそのまま使うこともできる。
         """
         if not self.ready:
-            print("AIWorker: vectorize_images called but AI is NOT READY.", flush=True)
+            logger.warning("AIWorker: vectorize_images called but AI is NOT READY.")
             self.features_ready.emit(paths, None)
-            return
+            return paths, None
 
         # 停止フラグをリセット
         self.reset_stop_flag()
         
-        print(f"AIWorker: Start vectorizing {len(paths)} images for clustering...", flush=True)
-
-        valid_paths = []
-        valid_images = []
-
-        # 1. 画像読み込み
-        for p in paths:
-            if not self.run_flag:
-                print("AIWorker: Image loading stopped by user", flush=True)
-                self.features_ready.emit(valid_paths, None)
-                return
-            
-            try:
-                img = self.Image.open(p).convert('RGB')
-                valid_images.append(img)
-                valid_paths.append(p)
-            except Exception as e:
-                print(f"AIWorker: Skip invalid image {os.path.basename(p)}: {e}", flush=True)
-
-        if not valid_images:
-            print("AIWorker: No valid images to process.", flush=True)
-            self.features_ready.emit([], None)
-            return
-
-        # 2. バッチ処理で特徴抽出
-        # メモリ溢れ防止のため、少しずつ処理する（例: 32枚ずつ）
-        from config import config
-        batch_size = config.BATCH_SIZE_CLUSTERING
-        all_features = []
+        logger.info("AIWorker: Start vectorizing %d images for clustering...", len(paths))
+
+        # 変更のない画像は前回の特徴量を再利用する
+        keys = [self._feature_key(p) for p in paths]
+        cached = self._load_cached_features(keys)
+        logger.debug("AIWorker: %d features found in cache.", len(cached))
+
+        # 結果は最初に確保した1つのテンソルへ行ごとに書き込む（リスト+結合による二重確保を避ける）
+        torch = self.torch
+        final_tensor = torch.empty((len(paths), self.mod.config.projection_dim),
+                                   dtype=torch.float16, device=self.device)
+        filled = [False] * len(paths)
+
+        hit_rows = [i for i, key in enumerate(keys) if key in cached]
+        if hit_rows:
+            # バイト列を連結して1回で行列に変換（行ごとのテンソル生成とstackを避ける）
+            hits = torch.frombuffer(bytearray(b"".join(cached[keys[i]] for i in hit_rows)), dtype=torch.float16)
+            final_tensor[hit_rows] = hits.view(len(hit_rows), -1).to(self.device)
+            for i in hit_rows:
+                filled[i] = True
+
+        # キャッシュに無い画像のみデコード・特徴抽出する
+        misses = [(i, p, key) for i, (p, key) in enumerate(zip(paths, keys)) if key and key not in cached]
+
+        def collected():
+            rows = [i for i, ok in enumerate(filled) if ok]
+            features = final_tensor if len(rows) == len(paths) else final_tensor[rows]
+            return [paths[i] for i in rows], features
+
+        # 1. 画像読み込み（並列）と 2. バッチ処理での特徴抽出 を重ねて実行
+        # デコード済み画像は batch_size * 2 枚までに抑え、メモリ溢れを防ぐ
+        batch_size = self._compiled_batch_size or self._clustering_batch_size()
+        if self._vision_compiled is not None:
+            logger.info("AIWorker: First batch of %d triggers a one-time compilation.", batch_size)
 
         try:
-            total = len(valid_images)
-            print(f"AIWorker: Processing {total} images in batches of {batch_size}...", flush=True)
-
-            for i in range(0, total, batch_size):
+            logger.debug("AIWorker: Processing %d images in batches of %d...", len(misses), batch_size)
+
+            pool = self._decode_pool
+            todo = iter(misses)
+            pending = deque()
+
+            def fill():
+                while len(pending) < batch_size * 2:
+                    item = next(todo, None)
+                    if item is None:
+                        return
+                    pending.append(item + (pool.submit(self._load_clip_image, item[1]),))
+
+            fill()
+            done = 0
+            total = len(paths)
+            finished = total - len(misses)  # キャッシュ済み・読み込み不可の分は処理済み扱い
+            self.progress.emit(finished, total)
+            while pending:
                 if not self.run_flag:
-                    print("AIWorker: Processing stopped by user", flush=True)
-                    self.features_ready.emit(valid_paths[:i], None)
-                    return
-                
-                batch_imgs = valid_images[i: i + batch_size]
-                print(f"AIWorker: Processing batch {i} to {i + len(batch_imgs)}...", flush=True)
-
-                inputs = self.proc(images=batch_imgs, return_tensors="pt", padding=True)
+                    logger.info("AIWorker: Processing stopped by user")
+                    for *_, fut in pending:
+                        fut.cancel()
+                    break
+
+                batch_imgs = []
+                batch_rows = []
+                batch_keys = []
+                while pending and len(batch_imgs) < batch_size:
+                    row, p, key, fut = pending.popleft()
+                    finished += 1
+                    try:
+                        batch_imgs.append(fut.result())
+                        batch_rows.append(row)
+                        batch_keys.append(key)
+                    except Exception as e:
+                        logger.debug("AIWorker: Skip invalid image %s: %s", os.path.basename(p), e)
+                    fill()
+
+                if not batch_imgs:
+                    self.progress.emit(finished, total)
+                    continue
 
-                with self.torch.no_grad():
-                    img_features = self.mod.get_image_features(**inputs)
+                logger.debug("AIWorker: Processing batch %d to %d...", done, done + len(batch_imgs))
+                done += len(batch_imgs)
+
+                n_imgs = len(batch_imgs)
+                if self._vision_compiled is not None and n_imgs < batch_size:
+                    # コンパイル済みグラフが再特殊化しないよう、常に同じバッチサイズで推論する
+                    batch_imgs = batch_imgs + [batch_imgs[-1]] * (batch_size - n_imgs)
+                inputs = self._image_inputs(batch_imgs)
+                # 入力テンソルを作った時点でデコード済み画像は不要（次のバッチの読み込み中に残さない）
+                del batch_imgs
+
+                with torch.inference_mode():
+                    with self._autocast():
+                        img_features = self._clustering_image_features(inputs)
+                    del inputs
+                    img_features = img_features[:n_imgs].float()
                     # 正規化 (これをしないとコサイン類似度が正しく計算できない)
-                    img_features /= img_features.norm(dim=-1, keepdim=True)
-                    all_features.append(img_features)
-
-            if not self.run_flag:
-                print("AIWorker: Processing stopped by user", flush=True)
-                self.features_ready.emit(valid_paths[:len(all_features) * batch_size], None)
-                return
-
-            # 3. 全バッチを結合
-            print("AIWorker: Concatenating features...", flush=True)
-            final_tensor = self.torch.cat(all_features, dim=0)
-
-            print(f"AIWorker: Vectorization Done. Shape: {final_tensor.shape}", flush=True)
-            self.features_ready.emit(valid_paths, final_tensor)
+                    img_features = self.F.normalize(img_features, dim=-1)
+                    if batch_rows[-1] - batch_rows[0] == len(batch_rows) - 1:
+                        # 連続した行ならスライスへ直接コピー
+                        final_tensor[batch_rows[0]:batch_rows[-1] + 1].copy_(img_features)
+                    else:
+                        final_tensor[batch_rows] = img_features.half()
+
+                for row in batch_rows:
+                    filled[row] = True
+                # 新規分をキャッシュへ保存
+                self._save_cached_features(batch_keys, img_features)
+                self.progress.emit(finished, total)
+
+            valid_paths, features = collected()
+            if not valid_paths:
+                logger.info("AIWorker: No valid images to process.")
+                self.features_ready.emit([], None)
+                return [], None
+
+            logger.info("AIWorker: Vectorization Done. Shape: %s", tuple(features.shape))
+            self.features_ready.emit(valid_paths, features)
+            return valid_paths, features
             
         except Exception as e:
-            print(f"AIWorker: Vectorization CRASHED: {e}", flush=True)
-            logger.error(f"Vectorization error: {e}", exc_info=True)
+            logger.error("AIWorker: Vectorization CRASHED: %s", e, exc_info=True)
+            valid_paths = collected()[0]
             self.features_ready.emit(valid_paths, None)
+            return valid_paths, None
 
     # ★追加機能: イベントラベリング用
+    def _encode_event_labels(self):
+        """EVENT_LABELSのテキスト特徴量を計算して保持（ラベルは固定なので1回だけ）"""
+        text_inputs = self._to_device(self.tok(list(EVENT_LABELS), return_tensors="pt", padding=True, truncation=True))
+        with self.torch.inference_mode():
+            with self._autocast():
+                text_feats = self._text_features(text_inputs)
+            text_feats = text_feats.float()
+            text_feats = self.F.normalize(text_feats, dim=-1)
+        self._event_text_feats = text_feats
+
     def predict_event(self, image_paths, top_k=5):
         """
         イベント（画像のグループ）の代表的なラベルを推論する
@@ -290,68 +892,56 @@ class AIWorker(QThread):
         if not self.ready:
             return None
             
-        # 判定用ラベル（コンテキスト重視）
-        EVENT_LABELS = [
-            "ゴルフ", "バスケットボール", "野球", "サッカー", "テニス",
-            "仕事_書類", "スクリーンショット", 
-            "食事_居酒屋", "カフェ_スイーツ", "ラーメン",
-            "旅行_風景", "海_ビーチ", "山_自然", "神社_寺",
-            "街並み", "乗り物", "猫_ペット", "犬_ペット",
-            "集合写真", "屋内_部屋", "日常"
-        ]
-        
         try:
-            # ラベルのベクトル化（キャッシュしても良いが、ここでは都度計算）
-            text_inputs = self.proc(text=EVENT_LABELS, return_tensors="pt", padding=True)
-            with self.torch.no_grad():
-                text_feats = self.mod.get_text_features(**text_inputs)
-                text_feats /= text_feats.norm(dim=-1, keepdim=True)
+            # ラベルのベクトルはモデル読み込み時に計算済み（失敗していた場合はここで計算）
+            if self._event_text_feats is None:
+                self._encode_event_labels()
+            text_feats = self._event_text_feats
+
+            # 動画は先に除外する（間引いた後に除外すると判断に使う枚数が減るため）
+            # 拡張子はos.path.splitextより軽い文字列操作で取る
+            candidates = []
+            for p in image_paths:
+                dot = p.rfind(".")
+                if dot >= 0 and p[dot:].lower() in VIDEO_EXTS:
+                    continue
+                candidates.append(p)
 
             # 画像の選定（ランダムではなく、均等に分散させる）
-            if len(image_paths) > top_k:
-                step = len(image_paths) // top_k
-                selected_paths = [image_paths[i] for i in range(0, len(image_paths), step)][:top_k]
+            if len(candidates) > top_k:
+                step = len(candidates) // top_k
+                selected_paths = candidates[::step][:top_k]
             else:
-                selected_paths = image_paths
-
-            valid_images = []
-            for p in selected_paths:
-                # Video file skip check
-                ext = os.path.splitext(p)[1].lower()
-                if ext in ['.mp4', '.mov', '.avi', '.mkv', '.wmv', '.flv', '.webm']:
-                    print(f"AIWorker: Skipping video file {os.path.basename(p)}", flush=True)
-                    continue
+                selected_paths = candidates
 
-                try:
-                    img = self.Image.open(p).convert('RGB')
-                    valid_images.append(img)
-                except:
-                    continue
+            # 選んだ画像だけを並列にデコード
+            valid_images = [img for img in self._decode_many(selected_paths) if img is not None]
             
             if not valid_images:
                 return None
 
             # 画像のベクトル化
-            img_inputs = self.proc(images=valid_images, return_tensors="pt", padding=True)
-            with self.torch.no_grad():
-                img_feats = self.mod.get_image_features(**img_inputs)
-                img_feats /= img_feats.norm(dim=-1, keepdim=True)
-            
-            # 類似度計算: (画像数 x ラベル数)
-            sim_matrix = (100.0 * img_feats @ text_feats.T).softmax(dim=-1)
+            img_inputs = self._image_inputs(valid_images)
+            with self.torch.inference_mode():
+                with self._autocast():
+                    img_feats = self._image_features(img_inputs)
+                img_feats = img_feats.float()
+                img_feats = self.F.normalize(img_feats, dim=-1)
             
             # 平均スコアを取る
-            avg_scores = sim_matrix.mean(dim=0) # (ラベル数, )
+            # 順位付けが目的なのでsoftmaxは通さず、コサイン類似度をそのまま平均する
+            # 類似度の平均 = 画像ベクトルの平均との内積 なので、(画像数 x ラベル数) の行列は作らない
+            avg_scores = self.torch.mv(text_feats, img_feats.mean(dim=0)) # (ラベル数, )
             
             best_idx = avg_scores.argmax().item()
             best_score = avg_scores[best_idx].item()
             
             label = EVENT_LABELS[best_idx]
-            print(f"AIWorker: Event Prediction -> {label} (Score: {best_score:.2f})", flush=True)
+            logger.debug("AIWorker: Event Prediction -> %s (Score: %.2f)", label, best_score)
             
             # スコアが低すぎる場合は「その他」扱いでも良いが、一旦返す
             return label
 
         except Exception as e:
-            print(f"AIWorker: Event Prediction Error {e}", flush=True)
+            logger.error("AIWorker: Event Prediction Error %s", e)
             return None
\ No newline at end of file
@@ -1,41 +1,55 @@
 import sys
 import os
 import logging
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
-                             QLabel, QPushButton, QSlider, QListWidgetItem,
-                             QApplication, QFrame, QScrollArea, QGridLayout,
-                             QSizePolicy, QProgressBar, QButtonGroup, QSplitter)
-from PyQt6.QtCore import Qt, QSize, QThread, pyqtSignal
-from PyQt6.QtGui import QIcon, QPalette, QColor
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView,
+                             QLabel, QPushButton, QSlider, QAbstractItemView,
+                             QApplication, QFrame, QProgressBar, QButtonGroup, QSplitter)
+from PyQt6.QtCore import Qt, QSize, QThread, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtGui import QIcon, QPalette, QColor, QKeySequence, QShortcut, QPixmap, QPixmapCache
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core import get_db_thumbnail, setup_logging, DatabaseManager, get_file_info, format_file_size
+from core import DbThumbnailLoader, thumbnail_cache_key, thumbnail_from_blob, setup_logging, DatabaseManager, get_file_info, format_file_size
+from gui.models import ThumbnailListModel
+from config import config
 
 logger = logging.getLogger(__name__)
 
+# スライダー操作が止まってから結果をリセットするまでの待ち時間(ms)
+SLIDER_DEBOUNCE_MS = 150
+
 
 # --- Worker ---
 class BlurLoadWorker(QThread):
     progress = pyqtSignal(int, int)
-    item_loaded = pyqtSignal(dict)  # 辞書ごと送る
+    items_loaded = pyqtSignal(list)  # 辞書のリストをまとめて送る
     finished = pyqtSignal(int)
 
-    def __init__(self, db, threshold):
+    BATCH_SIZE = 64  # DBから読み出し・UIへ送る1回分の件数
+
+    def __init__(self, db, threshold, thumb_size=120):
         super().__init__()
         self.db = db
         self.threshold = threshold
+        self.thumb_size = thumb_size
         self.is_running = True
 
     def run(self):
-        rows = self.db.get_blurry_files(self.threshold)
-        total = len(rows)
-        for i, (fid, path) in enumerate(rows):
+        total = self.db.count_blurry_files(self.threshold)
+        done = 0
+        for chunk in self.db.iter_blurry_files(self.threshold, self.BATCH_SIZE):
             if not self.is_running: break
-            # データパッケージング
-            item = {'id': fid, 'path': path}
-            self.item_loaded.emit(item)
-            if i % 5 == 0: self.progress.emit(i + 1, total)
-        self.finished.emit(total)
+            items = []
+            for fid, path, blob in chunk:
+                if not self.is_running: break
+                # DBにあるサムネイルはワーカー側でQImageまで用意（QPixmapはGUIスレッドで変換）
+                # 無いものは生成に時間がかかるため、一覧に表示された時点でモデルが読み込む
+                thumb = thumbnail_from_blob(blob, self.thumb_size) if blob else None
+                # データパッケージング
+                items.append({'id': fid, 'path': path, 'name': os.path.basename(path), 'thumb': thumb})
+            self.items_loaded.emit(items)
+            done += len(items)
+            self.progress.emit(done, total)
+        self.finished.emit(done)
 
     def stop(self):
         self.is_running = False
@@ -48,7 +62,10 @@ class BlurPage(QWidget):
         self.db = db_manager
         self.worker = None
         self.view_mode = "grid"
-        self.loaded_items = []  # データを保持
+        self.model = ThumbnailListModel(self.db, thumb_size=120)
+        self._preview_fid = None  # プレビュー表示中（読み込み中）のファイルID
+        # 一覧・プレビューのサムネイルはQPixmapCacheに載せるため、上限を確保しておく
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), config.PIXMAP_CACHE_LIMIT_KB))
         self.init_ui()
 
     def init_ui(self):
@@ -60,6 +77,9 @@ class BlurPage(QWidget):
             QSlider::handle:horizontal { background: #e0e0e0; border: 1px solid #777; width: 14px; margin: -5px 0; border-radius: 7px; }
             QProgressBar { border: none; background-color: #2d2d30; height: 4px; border-radius: 2px; }
             QProgressBar::chunk { background-color: #d83b01; border-radius: 2px; }
+            QPushButton#delBtn { background-color: #d83b01; color: white; border: none; border-radius: 4px; font-weight: bold; padding: 0 10px; }
+            QPushButton#delBtn:hover { background-color: #ff5522; }
+            QPushButton#delBtn:pressed { background-color: #b33000; }
         """)
 
         main_layout = QHBoxLayout(self)
@@ -86,6 +106,11 @@ class BlurPage(QWidget):
         self.slider.setRange(0, 50)
         self.slider.setValue(20)
         self.slider.valueChanged.connect(self.on_change)
+        # ドラッグ中は1目盛りごとに結果をリセットしない
+        self._slider_timer = QTimer(self)
+        self._slider_timer.setSingleShot(True)
+        self._slider_timer.setInterval(SLIDER_DEBOUNCE_MS)
+        self._slider_timer.timeout.connect(self._apply_slider_change)
         conf_layout.addWidget(self.slider)
 
         self.lbl_val = QLabel("閾値: 20")
@@ -149,25 +174,42 @@ class BlurPage(QWidget):
         self.view_group.addButton(self.btn_view_list)
         self.view_group.buttonClicked.connect(self.toggle_view)
 
+        self.btn_trash = QPushButton("選択をゴミ箱へ")
+        self.btn_trash.setFixedHeight(30)
+        self.btn_trash.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_trash.setObjectName("delBtn")
+        self.btn_trash.clicked.connect(self.trash_selected)
+
         header_layout.addWidget(header_lbl)
         header_layout.addStretch()
+        header_layout.addWidget(self.btn_trash)
         header_layout.addWidget(self.btn_view_grid)
         header_layout.addWidget(self.btn_view_list)
 
         right_layout.addLayout(header_layout)
 
-        # エリア
-        self.area = QScrollArea()
-        self.area.setWidgetResizable(True)
-        self.area.setStyleSheet("border: none; background-color: transparent;")
-        self.container = QWidget()
-        self.grid = QGridLayout(self.container)
-        self.grid.setContentsMargins(0, 0, 0, 0)
-        self.grid.setSpacing(10)
-        self.grid.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-        self.area.setWidget(self.container)
-
-        right_layout.addWidget(self.area)
+        # 結果一覧（表示中の行だけ描画されるQListView）
+        self.view = QListView()
+        self.view.setStyleSheet("""
+            QListView { border: none; background-color: transparent; }
+            QListView::item { background-color: #2d2d30; border: 1px solid #3e3e42; border-radius: 6px; color: #ccc; }
+            QListView::item:hover { border-color: #d83b01; background-color: #3e3e42; }
+            QListView::item:selected { border-color: #d83b01; background-color: #4a2a1e; }
+        """)
+        self.view.setUniformItemSizes(True)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setMovement(QListView.Movement.Static)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.view.setWordWrap(True)
+        self.view.setModel(self.model)
+        self.view.selectionModel().currentChanged.connect(
+            lambda cur, _prev: self.update_preview(cur.data(Qt.ItemDataRole.UserRole)))
+        self.apply_view_mode()
+
+        QShortcut(QKeySequence(Qt.Key.Key_Delete), self.view, activated=self.trash_selected)
+
+        right_layout.addWidget(self.view)
         
         right_splitter.addWidget(grid_panel)
         
@@ -207,35 +249,51 @@ class BlurPage(QWidget):
         val = self.slider.value()
         desc = " (廃棄レベル)" if val < 15 else " (かなりボケ)" if val < 30 else " (ソフトフォーカス?)"
         self.lbl_val.setText(f"閾値: {val}{desc}")
+        self._slider_timer.start()
+
+    def _apply_slider_change(self):
         # リセット
-        self.clear_grid()
-        self.loaded_items = []
+        self.model.clear()
         self.lbl_status.setText("設定変更: 更新ボタンを押してください")
 
     def toggle_view(self, btn):
         self.view_mode = "grid" if btn == self.btn_view_grid else "list"
-        if self.loaded_items:
-            self.render_all_items()
+        self.apply_view_mode()
+
+    def apply_view_mode(self):
+        """表示モードに合わせてQListViewの配置とサイズを切り替え（モデルはそのまま）"""
+        if self.view_mode == "grid":
+            self.view.setViewMode(QListView.ViewMode.IconMode)
+            self.view.setFlow(QListView.Flow.LeftToRight)
+            self.view.setWrapping(True)
+            self.view.setIconSize(QSize(120, 120))
+            self.view.setGridSize(QSize(140, 180))
+            self.view.setSpacing(0)
+        else:
+            self.view.setViewMode(QListView.ViewMode.ListMode)
+            self.view.setFlow(QListView.Flow.TopToBottom)
+            self.view.setWrapping(False)
+            self.view.setIconSize(QSize(80, 80))
+            self.view.setGridSize(QSize())
+            self.view.setSpacing(5)
+        self.model.set_thumb_size(self.view.iconSize().width())
+        self.model.set_show_path(self.view_mode == "list")
 
     def load_data(self):
-        self.clear_grid()
-        self.loaded_items = []
+        # 保留中のスライダー変更で読み込み中の結果が消されないようにする
+        self._slider_timer.stop()
+        self.model.clear()
         self.btn_refresh.setEnabled(False)
         self.progress.setValue(0)
         self.lbl_status.setText("検索中...")
 
         threshold = self.slider.value()
-        self.worker = BlurLoadWorker(self.db, threshold)
-        self.worker.item_loaded.connect(self.on_item_loaded)
+        self.worker = BlurLoadWorker(self.db, threshold, thumb_size=self.model.thumb_size)
+        self.worker.items_loaded.connect(self.model.extend)
         self.worker.progress.connect(lambda c, t: self.progress.setValue(int(c / t * 100) if t else 0))
         self.worker.finished.connect(self.on_finished)
         self.worker.start()
 
-    def on_item_loaded(self, item):
-        self.loaded_items.append(item)
-        # 逐次描画
-        self.add_single_item(item, len(self.loaded_items) - 1)
-
     def on_finished(self, total):
         self.btn_refresh.setEnabled(True)
         self.progress.setValue(100)
@@ -244,121 +302,31 @@ class BlurPage(QWidget):
         else:
             self.lbl_status.setText(f"完了: {total}枚")
 
-    def render_all_items(self):
-        self.clear_grid()
-        for i, item in enumerate(self.loaded_items):
-            self.add_single_item(item, i)
-
-    def add_single_item(self, item, index):
-        if self.view_mode == "grid":
-            self.render_grid_item(item, index)
-        else:
-            self.render_list_item(item, index)
-
-    def render_grid_item(self, item, index):
-        cols = 5
-        row, col = divmod(index, cols)
-        thumb_size = 120
-
-        f = QFrame()
-        f.setFixedSize(140, 180)
-        f.setStyleSheet("""
-            QFrame { background-color: #2d2d30; border: 1px solid #3e3e42; border-radius: 6px; }
-            QFrame:hover { border-color: #d83b01; background-color: #3e3e42; }
-        """)
-        
-        def make_cb(d):
-            return lambda ev: self.update_preview(d)
-        f.mousePressEvent = make_cb(item)
-        f.setCursor(Qt.CursorShape.PointingHandCursor)
+    def trash_selected(self):
+        """
+        選択中の行をゴミ箱へ移動
         
-        l = QVBoxLayout(f)
-        l.setContentsMargins(5, 5, 5, 5)
-        l.setSpacing(2)
-
-        lbl = QLabel()
-        pix = get_db_thumbnail(self.db, item['id'], item['path'], thumb_size)
-        lbl.setPixmap(pix)
-        lbl.setScaledContents(True)
-        lbl.setFixedSize(thumb_size, thumb_size)
-        lbl.setStyleSheet("border: none; border-radius: 4px; background: #000;")
-
-        name_lbl = QLabel(os.path.basename(item['path']))
-        name_lbl.setStyleSheet("border: none; font-size: 10px; color: #ccc;")
-        name_lbl.setWordWrap(True)
-        name_lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        name_lbl.setFixedHeight(25)
-
-        btn = QPushButton("削除")
-        btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn.setFixedHeight(20)
-        btn.setStyleSheet(self.get_del_btn_style())
-        btn.clicked.connect(lambda _, fid=item['id'], w=f: self.trash(fid, w))
-
-        l.addWidget(lbl, alignment=Qt.AlignmentFlag.AlignCenter)
-        l.addWidget(name_lbl)
-        l.addWidget(btn)
-
-        self.grid.addWidget(f, row, col)
-
-    def render_list_item(self, item, index):
-        thumb_size = 80
-        f = QFrame()
-        f.setFixedHeight(100)
-        f.setStyleSheet("""
-            QFrame { background-color: #2d2d30; border: 1px solid #3e3e42; border-radius: 6px; }
-            QFrame:hover { border-color: #d83b01; background-color: #353538; }
-        """)
-        l = QHBoxLayout(f)
-        l.setContentsMargins(10, 10, 10, 10)
-        l.setSpacing(15)
-
-        lbl = QLabel()
-        pix = get_db_thumbnail(self.db, item['id'], item['path'], thumb_size)
-        lbl.setPixmap(pix)
-        lbl.setScaledContents(True)
-        lbl.setFixedSize(thumb_size, thumb_size)
-        lbl.setStyleSheet("border: none; border-radius: 4px; background: #000;")
-
-        info_layout = QVBoxLayout()
-        name_lbl = QLabel(os.path.basename(item['path']))
-        name_lbl.setStyleSheet("border: none; font-size: 14px; font-weight: bold; color: #fff;")
-        path_lbl = QLabel(item['path'])
-        path_lbl.setStyleSheet("border: none; font-size: 11px; color: #888;")
-
-        info_layout.addWidget(name_lbl)
-        info_layout.addWidget(path_lbl)
-        info_layout.addStretch()
-
-        btn = QPushButton("ゴミ箱へ")
-        btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        btn.setFixedSize(80, 30)
-        btn.setStyleSheet(self.get_del_btn_style())
-        btn.clicked.connect(lambda _, fid=item['id'], w=f: self.trash(fid, w))
-
-        l.addWidget(lbl)
-        l.addLayout(info_layout, stretch=1)
-        l.addWidget(btn)
-
-        self.grid.addWidget(f, index, 0)
-
-    def get_del_btn_style(self):
-        return """
-            QPushButton { background-color: #d83b01; color: white; border: none; border-radius: 4px; font-weight: bold; }
-            QPushButton:hover { background-color: #ff5522; }
-            QPushButton:pressed { background-color: #b33000; }
+        行番号がずれないよう後ろから処理し、移動できた連続した行はまとめてモデルから外す。
         """
-
-    def trash(self, fid, widget):
-        if self.db.move_to_trash(fid):
-            widget.hide()
-        else:
+        rows = sorted((idx.row() for idx in self.view.selectionModel().selectedIndexes()), reverse=True)
+        failed = 0
+        run_first = run_last = None  # 削除待ちの連続した行の範囲
+        for row in rows:
+            if not self.db.move_to_trash(self.model.items[row]['id']):
+                failed += 1
+                continue
+            if run_first is not None and row == run_first - 1:
+                run_first = row
+                continue
+            if run_first is not None:
+                self.model.remove_rows(run_first, run_last)
+            run_first = run_last = row
+        if run_first is not None:
+            self.model.remove_rows(run_first, run_last)
+
+        if failed:
             from PyQt6.QtWidgets import QMessageBox
-            QMessageBox.warning(self, "削除失敗", "ファイルの削除に失敗しました。\nログを確認してください。")
-
-        while self.grid.count():
-            item = self.grid.takeAt(0)
-            if item.widget(): item.widget().deleteLater()
+            QMessageBox.warning(self, "削除失敗", f"{failed}件のファイルの削除に失敗しました。\nログを確認してください。")
             
     def update_preview(self, item):
         if not item: return
@@ -366,17 +334,21 @@ class BlurPage(QWidget):
         path = item['path']
         fid = item['id']
         
-        # Pixmap
-        pix = get_db_thumbnail(self.db, fid, path, 400)
-        if pix:
+        # Pixmap（キャッシュに無ければスレッドプールで読み込み、届いた時点で表示）
+        self._preview_fid = fid
+        pix = QPixmapCache.find(thumbnail_cache_key(fid, 400))
+        if pix is not None and not pix.isNull():
             self.preview_image.setPixmap(pix)
         else:
-            self.preview_image.setText("No Preview")
+            self.preview_image.setText("読み込み中...")
+            loader = DbThumbnailLoader(self.db, fid, path, 400)
+            loader.signals.finished.connect(self.on_preview_loaded)
+            QThreadPool.globalInstance().start(loader)
             
         # Info
         info = get_file_info(path)
         txt = []
-        txt.append(f"<b>ファイル名:</b> {os.path.basename(path)}")
+        txt.append(f"<b>ファイル名:</b> {item['name']}")
         txt.append(f"<b>パス:</b> {path}")
         if info['exists']:
             txt.append(f"<b>サイズ:</b> {format_file_size(info['file_size'])}")
@@ -387,6 +359,13 @@ class BlurPage(QWidget):
             
         self.preview_info.setText("<br>".join(txt))
 
+    def on_preview_loaded(self, fid, size, image):
+        pix = QPixmap.fromImage(image)
+        QPixmapCache.insert(thumbnail_cache_key(fid, size), pix)
+        # 読み込み中に別の画像が選ばれていたら表示しない
+        if fid == self._preview_fid:
+            self.preview_image.setPixmap(pix)
+
 
 if __name__ == "__main__":
     setup_logging()
@@ -4,15 +4,19 @@ DBSCANクラスタリングを使用して画像を自動的にグループ化
 """
 import sys
 import os
+import hashlib
 import shutil
 import logging
+import itertools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from typing import List, Optional
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
                              QFileDialog, QFrame, QScrollArea, QProgressBar,
                              QMessageBox, QInputDialog)
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtCore import Qt, QSize, QThread, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtGui import QPixmap, QPixmapCache, QPainter
 
 # 設定
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -21,20 +25,320 @@ from config import config
 # インポート確認
 try:
     from sklearn.cluster import DBSCAN
+    from scipy.sparse import csr_matrix  # scikit-learnの依存ライブラリ
     SKLEARN_AVAILABLE = True
 except ImportError:
     SKLEARN_AVAILABLE = False
 
+# BLASのスレッド数制御（scikit-learnの依存ライブラリ）: 親プロセスから1スレッドに絞られていても全コアを使う
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# 近似近傍探索（任意）: 枚数が多い場合のDBSCANを高速化
+try:
+    import hnswlib
+    HNSW_AVAILABLE = True
+except ImportError:
+    HNSW_AVAILABLE = False
+
 AI_AVAILABLE = True
 logger = logging.getLogger(__name__)
 
+# GPU上で距離を計算する際、1回に処理する行数
+GPU_GRAPH_CHUNK = 1024
+
+# グループ移動時に並列で行うファイル移動の数（ドライブ間の移動はコピー+削除になるため）
+MOVE_WORKERS = 8
+
+# グループ内に表示するサムネイルの大きさ・間隔・枚数
+CLUSTER_THUMB_SIZE = 100
+CLUSTER_THUMB_SPACING = 5
+CLUSTER_THUMB_COUNT = 12
+
+# スクロール・リサイズ後、表示中のグループのサムネイル読み込みを始めるまでの待ち時間
+VISIBLE_THUMBS_DELAY_MS = 50
+
+# クラスタリング対象の拡張子
+CLUSTER_IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _gpu_radius_graph(tensor):
+    """
+    GPU上の特徴量からコサイン距離がDBSCAN_EPS以下の組だけを疎行列にする
+
+    距離計算はFP16の行列積で行い（メモリ転送量が半分）、CPUへは条件を満たす辺だけを送る。
+    """
+    n = tensor.shape[0]
+    eps = config.DBSCAN_EPS
+    t = tensor.float()
+    t = (t / t.norm(dim=1, keepdim=True).clamp_min(1e-12)).half()
+    rows, cols, vals = [], [], []
+    for start in range(0, n, GPU_GRAPH_CHUNK):
+        dist = 1.0 - (t[start:start + GPU_GRAPH_CHUNK] @ t.T).float()
+        r, c = (dist <= eps).nonzero(as_tuple=True)
+        # 自分自身との距離は丸め誤差で負になることがあるので0に揃える
+        vals.append(dist[r, c].clamp_min(0).cpu().numpy())
+        rows.append((r + start).cpu().numpy())
+        cols.append(c.cpu().numpy())
+    return csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+
+def _dbscan_precomputed(graph):
+    """コサイン距離行列（密行列、またはeps以内の辺のみの疎行列）からDBSCANのグループIDを求める"""
+    return DBSCAN(eps=config.DBSCAN_EPS,
+                  min_samples=config.DBSCAN_MIN_SAMPLES,
+                  metric='precomputed',
+                  n_jobs=-1).fit(graph).labels_
+
+
+def _blas_all_cores():
+    """距離行列の計算中はBLASのスレッド数をCPUコア数にする（threadpoolctlが無ければ何もしない）"""
+    if threadpool_limits is None:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=os.cpu_count(), user_api='blas')
+
+
+def _dbscan_labels(X):
+    """
+    単位ベクトル化した特徴量をDBSCANでクラスタリングし、各画像のグループIDを返す
+
+    枚数がDBSCAN_DENSE_THRESHOLD以下なら、コサイン距離行列を行列積でまとめて計算する。
+
+    枚数がDBSCAN_ANN_THRESHOLDを超え、hnswlibがある場合は近似k近傍グラフ
+    （コサイン距離がeps以下の辺のみ）を作り、precomputedとしてDBSCANに渡す。
+
+    Xは float32 のC連続配列であること（それ以外だとsklearn・BLAS側で暗黙にN×Dのコピーが作られる）。
+    """
+    n = len(X)
+    if n <= config.DBSCAN_DENSE_THRESHOLD:
+        # 少ない枚数では距離行列全体を1回の行列積（BLASのSGEMM）で作り、precomputedで渡す
+        with _blas_all_cores():
+            D = X @ X.T
+        np.subtract(1.0, D, out=D)
+        np.clip(D, 0.0, None, out=D)  # 自分自身との距離が丸め誤差で負にならないように
+        return _dbscan_precomputed(D)
+
+    if HNSW_AVAILABLE and n > config.DBSCAN_ANN_THRESHOLD:
+        k = min(n, config.DBSCAN_ANN_NEIGHBORS)
+        index = hnswlib.Index(space='cosine', dim=X.shape[1])
+        index.init_index(max_elements=n, M=16, ef_construction=100)
+        index.add_items(X)
+        index.set_ef(max(64, k))
+        nbrs, dists = index.knn_query(X, k=k)
+        # 自分自身（距離0）も含めて、eps以内の近傍だけを疎行列に残す
+        keep = dists <= config.DBSCAN_EPS
+        rows = np.repeat(np.arange(n), k)[keep.ravel()]
+        graph = csr_matrix((dists[keep], (rows, nbrs[keep])), shape=(n, n))
+        return _dbscan_precomputed(graph)
+
+    # metric: 単位ベクトル同士では ||a-b||^2 = 2 - 2cos なので、コサイン距離epsを
+    #         ユークリッド距離 sqrt(2*eps) に変換して木構造の近傍探索を使う
+    # ball_treeは特徴量のコピー（N×D）と木の分だけメモリを追加で使うが、総当たりより速い
+    return DBSCAN(eps=float(np.sqrt(2 * config.DBSCAN_EPS)),
+                  min_samples=config.DBSCAN_MIN_SAMPLES,
+                  metric='euclidean',
+                  algorithm=config.DBSCAN_ALGORITHM,
+                  leaf_size=config.DBSCAN_LEAF_SIZE,
+                  n_jobs=-1).fit(X).labels_
+
+
+def _dbscan_cache_path(paths, tensor):
+    """特徴量・画像の並び・DBSCANのパラメータから、グループIDのキャッシュファイルのパスを求める"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    h.update("\n".join(paths).encode("utf-8"))
+    # 近似（hnswlib・GPUグラフ）と厳密な結果が混ざらないよう、経路を決める設定もキーに含める
+    use_gpu = tensor.is_cuda and config.DBSCAN_GPU_GRAPH
+    params = (config.DBSCAN_DENSE_THRESHOLD, config.DBSCAN_ANN_THRESHOLD, config.DBSCAN_ANN_NEIGHBORS,
+              HNSW_AVAILABLE, use_gpu, config.DBSCAN_ALGORITHM, config.DBSCAN_LEAF_SIZE)
+    h.update(repr(params).encode("utf-8"))
+    key = f"{h.hexdigest()}-{config.DBSCAN_EPS}-{config.DBSCAN_MIN_SAMPLES}"
+    return os.path.join(config.CACHE_DIR, "dbscan", f"{key}.npy")
+
+
+def _load_cached_labels(cache_path, n):
+    """キャッシュ済みのグループIDを読み込む（無い・壊れている場合はNone）"""
+    try:
+        labels = np.load(cache_path)
+    except (OSError, ValueError):
+        return None
+    if len(labels) != n:
+        return None
+    # 上限を超えたときに古い順（LRU）で消せるよう、更新日時を更新
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return labels
+
+
+def _prune_dbscan_cache(cache_dir):
+    """グループIDのキャッシュを更新日時の新しい順にDBSCAN_CACHE_MAX_FILES件だけ残す"""
+    try:
+        files = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(".npy")]
+        files.sort(key=os.path.getmtime, reverse=True)
+    except OSError:
+        return
+    for path in files[max(0, config.DBSCAN_CACHE_MAX_FILES):]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _save_cached_labels(cache_path, labels):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        np.save(cache_path, np.asarray(labels))
+    except OSError as e:
+        logger.warning(f"Failed to save DBSCAN cache {cache_path}: {e}")
+        return
+    _prune_dbscan_cache(os.path.dirname(cache_path))
+
+
+def _cluster_features(paths, tensor):
+    """
+    特徴量をDBSCANでクラスタリングし、(グループごとのパスのリスト, 分類不能のパス) を返す
+    """
+    # DBSCANアルゴリズムを実行
+    # eps: 類似度の距離閾値 (小さいほど厳密。CLIPのコサイン距離なら0.1~0.2くらい)
+    # min_samples: 最低何枚あればグループとみなすか (2枚以上)
+    # 同じフォルダ・同じパラメータでの再実行はキャッシュ済みの結果を使う
+    cache_path = _dbscan_cache_path(paths, tensor)
+    labels = _load_cached_labels(cache_path, len(paths))
+    if labels is not None:
+        logger.info(f"DBSCAN result loaded from cache: {cache_path}")
+    else:
+        if tensor.is_cuda and config.DBSCAN_GPU_GRAPH:
+            # GPU上にある特徴量はそのまま距離計算し、eps以内の組だけをCPUへ送る
+            labels = _dbscan_precomputed(_gpu_radius_graph(tensor))
+        else:
+            # FP16のままCPUへ転送してから、C連続のFP32のNumpy配列に変換
+            X = np.ascontiguousarray(tensor.detach().cpu().numpy(), dtype=np.float32)
+            # FP16で保持していた分の誤差を除くため、FP32で単位ベクトルに正規化し直す
+            X /= np.linalg.norm(X, axis=1, keepdims=True).clip(min=1e-12)
+            labels = _dbscan_labels(X)
+        _save_cached_labels(cache_path, labels)
+    # labels: 各画像のグループIDが入る [-1, 0, 0, 1, -1, 2...]
+
+    # 結果をまとめる: ラベル順に安定ソートし、ラベルが変わる位置で分割する
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    cuts = np.flatnonzero(np.diff(labels[order])) + 1
+    clusters = []
+    noise = []
+    for group in np.split(order, cuts):
+        if len(group) == 0:
+            continue
+        members = [paths[i] for i in group]
+        if labels[group[0]] == -1:
+            noise = members  # どこにも属さなかった孤独な写真
+        else:
+            clusters.append(members)
+
+    return clusters, noise
+
+
+def _unique_move_targets(file_paths, dest):
+    """
+    移動元ごとに重複しない移動先パスを決める（[(移動元, 移動先), ...] を返す）
+
+    別フォルダの同名ファイル（IMG_0001.JPG など）が同じ移動先を並列に書き込まないよう、
+    移動先フォルダの既存ファイルや先に割り当てた名前と衝突する場合は「_1」「_2」…を付ける。
+    """
+    try:
+        taken = {os.path.normcase(name) for name in os.listdir(dest)}
+    except OSError:
+        taken = set()
+    pairs = []
+    for src in file_paths:
+        name = os.path.basename(src)
+        stem, ext = os.path.splitext(name)
+        n = 0
+        while os.path.normcase(name) in taken:
+            n += 1
+            name = f"{stem}_{n}{ext}"
+        if n:
+            logger.info(f"Move target name collision: {src} -> {name}")
+        taken.add(os.path.normcase(name))
+        pairs.append((src, os.path.join(dest, name)))
+    return pairs
+
+
+def _iter_images(folder):
+    """
+    フォルダ以下の画像パスを順に返す（一覧を作らずに走査する）
+
+    os.scandir のエントリが持つ種別情報を使い、ファイルごとのstatを行わない。
+    os.walk と同じく各フォルダの画像を返してからサブフォルダへ進み、読めないフォルダは飛ばす。
+    """
+    stack = [folder]
+    while stack:
+        root = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                    except OSError:
+                        continue
+                    if entry.name.lower().endswith(CLUSTER_IMAGE_EXTS):
+                        yield entry.path
+        except OSError:
+            continue
+        # os.walk と同じく、見つけた順にサブフォルダを辿るよう逆順で積む
+        stack.extend(reversed(subdirs))
+
+
+class ClusteringWorker(QThread):
+    """
+    CLIPでのベクトル化からDBSCANまでをUIスレッドの外で行うワーカー
+
+    進捗はAIWorkerのprogressシグナルで通知され、UIスレッドには結果のパスのリストだけを送る。
+    """
+    status = pyqtSignal(str)
+    clusters_ready = pyqtSignal(list, list)  # (グループごとのパスのリスト, 分類不能のパス)
+    failed = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, ai_worker, paths):
+        super().__init__()
+        self.ai_worker = ai_worker
+        self.paths = list(paths)
+
+    def run(self):
+        paths, tensor = self.ai_worker.vectorize_images(self.paths)
+        if tensor is None:
+            self.failed.emit("ベクトル化失敗または停止されました")
+            return
+
+        self.status.emit("AI解析完了。DBSCANでクラスタリング中...")
+        try:
+            clusters, noise = _cluster_features(paths, tensor)
+        except Exception as e:
+            logger.error(f"Clustering error: {e}", exc_info=True)
+            self.error.emit(str(e))
+            return
+        self.clusters_ready.emit(clusters, noise)
+
 
 class ClusteringPage(QWidget):
-    def __init__(self):
+    def __init__(self, db_manager=None):
         super().__init__()
+        self.db = db_manager
         self.ai_worker = None
+        self.cluster_worker = None
         self.target_files = []
         self.is_processing = False
+        self._thumb_jobs = {}  # 読み込み中のサムネイル: ジョブ番号 -> (QLabel, 枠の番号, パス)
+        self._pending_strips = []  # サムネイル未読み込みの枠があるグループのラベル
+        self._thumb_job_seq = 0
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), config.PIXMAP_CACHE_LIMIT_KB))
         self.init_ui()
 
     def init_ui(self):
@@ -71,10 +375,31 @@ class ClusteringPage(QWidget):
         # 結果エリア
         self.scroll = QScrollArea()
         self.scroll.setWidgetResizable(True)
+        # グループ表示のスタイルはここで1回だけ設定し、各ウィジェットはobjectNameで参照する
+        # （中身のウィジェットを作り直しても適用されるようスクロールエリア側に設定）
+        self.scroll.setStyleSheet("""
+            QFrame#clusterCard { background-color: #252526; border-radius: 5px; margin-bottom: 10px; }
+            QLabel#clusterTitle { font-weight: bold; color: #fff; }
+            QLabel#clusterTitle[noise="true"] { color: #888; }
+            QPushButton#clusterMoveBtn { background-color: #d83b01; color: white; }
+        """)
+        self._reset_scroll_content()
+        layout.addWidget(self.scroll)
+
+        # サムネイルは画面に見えているグループの分だけ読み込む
+        self._visible_timer = QTimer(self)
+        self._visible_timer.setSingleShot(True)
+        self._visible_timer.setInterval(VISIBLE_THUMBS_DELAY_MS)
+        self._visible_timer.timeout.connect(self._load_visible_thumbs)
+        bar = self.scroll.verticalScrollBar()
+        bar.valueChanged.connect(self._visible_timer.start)
+        bar.rangeChanged.connect(self._visible_timer.start)
+
+    def _reset_scroll_content(self):
+        """結果表示用のウィジェットを新しく作って差し替える（古い方は子ごとまとめて破棄される）"""
         self.scroll_content = QWidget()
         self.scroll_layout = QVBoxLayout(self.scroll_content)
         self.scroll.setWidget(self.scroll_content)
-        layout.addWidget(self.scroll)
 
     def select_folder(self):
         if not SKLEARN_AVAILABLE:
@@ -85,24 +410,20 @@ class ClusteringPage(QWidget):
         folder = QFileDialog.getExistingDirectory(self, "フォルダ選択")
         if not folder: return
 
-        # 画像収集
-        exts = ('.jpg', '.jpeg', '.png', '.webp')
-        self.target_files = []
-        for root, _, files in os.walk(folder):
-            for f in files:
-                if f.lower().endswith(exts):
-                    self.target_files.append(os.path.join(root, f))
+        # 画像収集（上限+1枚まで見つけた時点で走査を打ち切る）
+        limit = config.MAX_CLUSTERING_IMAGES
+        self.target_files = list(itertools.islice(_iter_images(folder), limit + 1))
 
         if not self.target_files:
             QMessageBox.information(self, "情報", "画像ファイルが見つかりませんでした")
             return
 
         # 制限チェック: 超過している場合は処理を停止
-        if len(self.target_files) > config.MAX_CLUSTERING_IMAGES:
+        if len(self.target_files) > limit:
             reply = QMessageBox.warning(
                 self, 
                 "枚数制限超過",
-                f"選択したフォルダには {len(self.target_files):,} 枚の画像があります。\n\n"
+                f"選択したフォルダには {limit:,} 枚を超える画像があります。\n\n"
                 f"処理速度のため、最大 {config.MAX_CLUSTERING_IMAGES:,} 枚まで処理可能です。\n\n"
                 f"最初の {config.MAX_CLUSTERING_IMAGES:,} 枚のみ処理しますか？\n"
                 f"（「いいえ」を選択すると処理をキャンセルします）",
@@ -113,7 +434,7 @@ class ClusteringPage(QWidget):
                 self.lbl_status.setText("処理をキャンセルしました")
                 return
             
-            self.target_files = self.target_files[:config.MAX_CLUSTERING_IMAGES]
+            del self.target_files[limit:]
             QMessageBox.information(
                 self,
                 "制限適用",
@@ -148,22 +469,20 @@ class ClusteringPage(QWidget):
     def start_ai_process(self):
         if self.ai_worker and self.ai_worker.ready:
             # 停止フラグをリセットしてから処理開始
-            self.ai_worker.reset_stop_flag()
-            self.ai_worker.vectorize_images(self.target_files)
+            self._start_clustering()
             return
 
         try:
             from modules.ai_classifier import AIWorker
             if not self.ai_worker:
-                self.ai_worker = AIWorker()
+                self.ai_worker = AIWorker(self.db)
                 self.ai_worker.model_loaded.connect(self.on_model_loaded)
-                self.ai_worker.features_ready.connect(self.on_features_ready)
+                self.ai_worker.progress.connect(self.on_vectorize_progress)
                 self.ai_worker.start()
             else:
                 # 既にワーカーが存在する場合は、モデルがロードされるまで待つ
                 if self.ai_worker.ready:
-                    self.ai_worker.reset_stop_flag()
-                    self.ai_worker.vectorize_images(self.target_files)
+                    self._start_clustering()
         except ImportError as e:
             logger.error(f"Failed to import AIWorker: {e}")
             self.lbl_status.setText("AI初期化エラー: ライブラリが見つかりません")
@@ -173,6 +492,16 @@ class ClusteringPage(QWidget):
             self.lbl_status.setText("AI初期化エラー")
             self._reset_ui()
     
+    def _start_clustering(self):
+        """ベクトル化とDBSCANをワーカースレッドで開始する"""
+        self.ai_worker.reset_stop_flag()
+        self.cluster_worker = ClusteringWorker(self.ai_worker, self.target_files)
+        self.cluster_worker.status.connect(self.on_cluster_status)
+        self.cluster_worker.clusters_ready.connect(self.on_clusters_ready)
+        self.cluster_worker.failed.connect(self.on_cluster_failed)
+        self.cluster_worker.error.connect(self.on_cluster_error)
+        self.cluster_worker.start()
+
     def stop_processing(self):
         """処理を停止"""
         if self.is_processing and self.ai_worker:
@@ -190,7 +519,7 @@ class ClusteringPage(QWidget):
     def on_model_loaded(self, success):
         if success:
             if self.is_processing and self.target_files:
-                self.ai_worker.vectorize_images(self.target_files)
+                self._start_clustering()
         else:
             self.lbl_status.setText("AIモデルの読み込みに失敗しました")
             QMessageBox.critical(
@@ -208,66 +537,35 @@ class ClusteringPage(QWidget):
             )
             self._reset_ui()
 
-    def on_features_ready(self, paths, tensor):
-        if tensor is None:
-            if self.is_processing:
-                self.lbl_status.setText("ベクトル化失敗または停止されました")
-            else:
-                self.lbl_status.setText("ベクトル化失敗")
-            self.progress.setRange(0, 100)
-            self._reset_ui()
-            return
-        
-        if not self.is_processing:
-            # 停止された場合
-            self.lbl_status.setText("処理が停止されました")
-            self.progress.setRange(0, 100)
-            self._reset_ui()
-            return
-
-        self.lbl_status.setText(f"AI解析完了。DBSCANでクラスタリング中...")
+    def on_vectorize_progress(self, done, total):
+        """ベクトル化の進捗をプログレスバーに反映"""
+        self.progress.setRange(0, total)
+        self.progress.setValue(done)
+        self.lbl_status.setText(f"AI解析中... ({done}/{total})")
 
-        try:
-            # Tensor(GPU/CPU) を Numpy配列に変換
-            X = tensor.cpu().numpy()
-
-            # DBSCANアルゴリズムを実行
-            # eps: 類似度の距離閾値 (小さいほど厳密。CLIPのコサイン距離なら0.1~0.2くらい)
-            # min_samples: 最低何枚あればグループとみなすか (2枚以上)
-            # metric: コサイン距離を使う ('cosine')
-            db = DBSCAN(eps=config.DBSCAN_EPS, 
-                       min_samples=config.DBSCAN_MIN_SAMPLES, 
-                       metric='cosine').fit(X)
-
-            labels = db.labels_  # 各画像のグループIDが入る [-1, 0, 0, 1, -1, 2...]
-
-            # 結果をまとめる
-            clusters = {}
-            noise = []
-
-            for path, label in zip(paths, labels):
-                if label == -1:
-                    noise.append(path)  # どこにも属さなかった孤独な写真
-                else:
-                    if label not in clusters: clusters[label] = []
-                    clusters[label].append(path)
+    def on_cluster_status(self, text):
+        self.lbl_status.setText(text)
 
-            # リスト形式に変換して表示へ
-            sorted_clusters = list(clusters.values())
-            self.display_clusters(sorted_clusters, noise)
+    def on_clusters_ready(self, clusters, noise):
+        self.display_clusters(clusters, noise)
+        self.progress.setRange(0, 100)
+        self._reset_ui()
 
-        except Exception as e:
-            logger.error(f"Clustering error: {e}", exc_info=True)
-            self.lbl_status.setText(f"MLエラー: {e}")
-            QMessageBox.critical(self, "エラー", f"クラスタリング処理中にエラーが発生しました:\n{e}")
+    def on_cluster_failed(self, message):
+        self.lbl_status.setText(message)
+        self.progress.setRange(0, 100)
+        self._reset_ui()
 
+    def on_cluster_error(self, message):
+        self.lbl_status.setText(f"MLエラー: {message}")
+        QMessageBox.critical(self, "エラー", f"クラスタリング処理中にエラーが発生しました:\n{message}")
         self.progress.setRange(0, 100)
         self._reset_ui()
 
     def display_clusters(self, clusters, noise):
-        while self.scroll_layout.count():
-            child = self.scroll_layout.takeAt(0)
-            if child.widget(): child.widget().deleteLater()
+        self._reset_scroll_content()
+        self._thumb_jobs.clear()  # 破棄したラベルへの読み込み結果は捨てる
+        self._pending_strips.clear()
 
         self.lbl_status.setText(f"完了: {len(clusters)} グループを発見 ({len(noise)}枚は分類不能)")
         self._reset_ui()
@@ -284,24 +582,26 @@ class ClusteringPage(QWidget):
 
     def add_group_widget(self, title, files, is_noise=False):
         frame = QFrame()
-        frame.setStyleSheet("background-color: #252526; border-radius: 5px; margin-bottom: 10px;")
+        frame.setObjectName("clusterCard")
         vbox = QVBoxLayout(frame)
 
         hbox = QHBoxLayout()
         lbl = QLabel(f"{title} ({len(files)}枚)")
-        lbl.setStyleSheet(f"font-weight: bold; color: {'#888' if is_noise else '#fff'};")
+        lbl.setObjectName("clusterTitle")
+        lbl.setProperty("noise", is_noise)
 
         btn_move = QPushButton("移動...")
         btn_move.setFixedSize(80, 25)
-        btn_move.setStyleSheet("background-color: #d83b01; color: white;")
-        btn_move.clicked.connect(lambda _, f=files: self.move_group(f))
+        btn_move.setObjectName("clusterMoveBtn")
+        btn_move.setProperty("files", files)
+        btn_move.clicked.connect(self.on_move_clicked)
 
         hbox.addWidget(lbl)
         hbox.addStretch()
         hbox.addWidget(btn_move)
         vbox.addLayout(hbox)
 
-        # サムネイル（最初の10枚）
+        # サムネイル（先頭の CLUSTER_THUMB_COUNT 枚）
         scroll_h = QScrollArea()
         scroll_h.setFixedHeight(120)
         scroll_h.setWidgetResizable(True)
@@ -309,18 +609,77 @@ class ClusteringPage(QWidget):
         layout_h = QHBoxLayout(content_h)
         layout_h.setContentsMargins(0, 0, 0, 0)
 
-        for path in files[:12]:
-            lbl_img = QLabel()
-            pix = QPixmap(path).scaled(100, 100, Qt.AspectRatioMode.KeepAspectRatio,
-                                       Qt.TransformationMode.SmoothTransformation)
-            lbl_img.setPixmap(pix)
-            layout_h.addWidget(lbl_img)
+        # サムネイルは1枚の横長画像に描き込み、グループごとにラベル1つで表示する
+        shown = files[:CLUSTER_THUMB_COUNT]
+        step = CLUSTER_THUMB_SIZE + CLUSTER_THUMB_SPACING
+        strip = QPixmap(max(1, len(shown) * step - CLUSTER_THUMB_SPACING), CLUSTER_THUMB_SIZE)
+        strip.fill(Qt.GlobalColor.transparent)
+        lbl_strip = QLabel()
+        lbl_strip.setFixedSize(strip.size())
+        lbl_strip._strip = strip
+        lbl_strip._pending = []
+        for idx, path in enumerate(shown):
+            pix = QPixmapCache.find(f"cluster:{path}:{CLUSTER_THUMB_SIZE}")
+            if pix is not None and not pix.isNull():
+                self._draw_thumb(strip, idx, pix)
+            else:
+                lbl_strip._pending.append((idx, path))
+        lbl_strip.setPixmap(strip)
+        if lbl_strip._pending:
+            self._pending_strips.append(lbl_strip)
+            self._visible_timer.start()
+        layout_h.addWidget(lbl_strip)
 
         layout_h.addStretch()
         scroll_h.setWidget(content_h)
         vbox.addWidget(scroll_h)
         self.scroll_layout.addWidget(frame)
 
+    def _load_visible_thumbs(self):
+        """画面に見えているグループのサムネイルだけ読み込みを開始する"""
+        remaining = []
+        for label in self._pending_strips:
+            if label.visibleRegion().isEmpty():
+                remaining.append(label)
+                continue
+            for idx, path in label._pending:
+                self._load_thumb_async(label, idx, path)
+            label._pending = []
+        self._pending_strips = remaining
+
+    @staticmethod
+    def _draw_thumb(strip, idx, pix):
+        """横長画像のidx番目の枠の中央にサムネイルを描く"""
+        x = idx * (CLUSTER_THUMB_SIZE + CLUSTER_THUMB_SPACING) + (CLUSTER_THUMB_SIZE - pix.width()) // 2
+        y = (CLUSTER_THUMB_SIZE - pix.height()) // 2
+        painter = QPainter(strip)
+        painter.drawPixmap(x, y, pix)
+        painter.end()
+
+    def _load_thumb_async(self, label, idx, path):
+        """サムネイルをスレッドプールで縮小読み込みし、届いたらラベルの横長画像に描き込む"""
+        from core import ImageLoader
+        self._thumb_job_seq += 1
+        job = self._thumb_job_seq
+        self._thumb_jobs[job] = (label, idx, path)
+        loader = ImageLoader(job, path, QSize(CLUSTER_THUMB_SIZE, CLUSTER_THUMB_SIZE), disk_cache=True)
+        loader.signals.finished.connect(self.on_thumb_loaded)
+        QThreadPool.globalInstance().start(loader)
+
+    def on_thumb_loaded(self, job, image):
+        entry = self._thumb_jobs.pop(job, None)
+        if entry is None:
+            return
+        label, idx, path = entry
+        pix = QPixmap.fromImage(image)
+        QPixmapCache.insert(f"cluster:{path}:{CLUSTER_THUMB_SIZE}", pix)
+        self._draw_thumb(label._strip, idx, pix)
+        label.setPixmap(label._strip)
+
+    def on_move_clicked(self):
+        """全グループの移動ボタン共通のスロット（対象はボタンに持たせたファイル一覧）"""
+        self.move_group(self.sender().property("files"))
+
     def move_group(self, file_paths):
         dest = QFileDialog.getExistingDirectory(self, "移動先フォルダ")
         if not dest: return
@@ -330,15 +689,31 @@ class ClusteringPage(QWidget):
             dest = os.path.join(dest, text)
             os.makedirs(dest, exist_ok=True)
 
-        for src in file_paths:
+        def move_one(pair):
+            """1ファイルを移動し、失敗時は (パス, 例外) を返す"""
+            src, target = pair
+            if not config.validate_path(src) or not config.validate_path(dest):
+                logger.warning(f"Invalid path for move: src={src}, dest={dest}")
+                return None
             try:
-                if not config.validate_path(src) or not config.validate_path(dest):
-                    logger.warning(f"Invalid path for move: src={src}, dest={dest}")
-                    continue
-                shutil.move(src, os.path.join(dest, os.path.basename(src)))
-            except (OSError, IOError, shutil.Error) as e:
-                logger.error(f"Failed to move file {src} to {dest}: {e}")
+                shutil.move(src, target)
             except Exception as e:
-                logger.error(f"Unexpected error moving file {src}: {e}", exc_info=True)
+                return src, e
+            return None
+
+        if file_paths:
+            # 移動先の名前は並列に移動する前にこのスレッドで決め、1つの移動先を1ジョブだけが書き込むようにする
+            pairs = _unique_move_targets(file_paths, dest)
+            with ThreadPoolExecutor(max_workers=min(MOVE_WORKERS, len(pairs))) as ex:
+                results = list(ex.map(move_one, pairs))
+            # ログはすべての移動が終わってからまとめて出力
+            for failed in results:
+                if failed is None:
+                    continue
+                src, e = failed
+                if isinstance(e, (OSError, IOError, shutil.Error)):
+                    logger.error(f"Failed to move file {src} to {dest}: {e}")
+                else:
+                    logger.error(f"Unexpected error moving file {src}: {e}", exc_info=e)
 
         QMessageBox.information(self, "完了", "移動しました")
\ No newline at end of file
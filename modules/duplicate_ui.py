@@ -1,18 +1,131 @@
 import sys
 import os
 import logging
-from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget,
-                             QLabel, QPushButton, QListWidgetItem, QScrollArea,
-                             QFrame, QApplication, QGridLayout, QButtonGroup, QSizePolicy, QSplitter)
-from PyQt6.QtCore import Qt, QSize
-from PyQt6.QtGui import QIcon, QPalette, QColor, QWheelEvent
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QListView,
+                             QLabel, QPushButton, QListWidgetItem, QAbstractItemView,
+                             QFrame, QApplication, QButtonGroup, QSizePolicy, QSplitter,
+                             QStyle, QStyledItemDelegate, QStyleOptionViewItem)
+from PyQt6.QtCore import Qt, QSize, QRect, QEvent, pyqtSignal
+from PyQt6.QtGui import QIcon, QPalette, QColor, QWheelEvent, QPixmap, QPainter
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core import get_db_thumbnail, setup_logging, DatabaseManager, get_file_info, format_file_size
+from gui.models import ThumbnailListModel
 from config import config
 
 logger = logging.getLogger(__name__)
 
+# リスト表示のサムネイルサイズ
+LIST_THUMBNAIL_SIZE = 80
+
+
+class DuplicateItemDelegate(QStyledItemDelegate):
+    """
+    重複グループの1枚分（サムネイル・ファイル名・削除ボタン）を描画するデリゲート
+
+    ボタンはウィジェットを作らずに描画だけ行い、ボタン上でのクリックを delete_requested(行番号) で通知する。
+    """
+    delete_requested = pyqtSignal(int)
+
+    MARGIN = 8
+    GRID_BUTTON_HEIGHT = 22
+    LIST_BUTTON_SIZE = QSize(80, 30)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.list_mode = False
+        self.thumb_size = config.DEFAULT_GRID_THUMBNAIL_SIZE
+
+    def button_rect(self, rect):
+        m = self.MARGIN
+        if self.list_mode:
+            w, h = self.LIST_BUTTON_SIZE.width(), self.LIST_BUTTON_SIZE.height()
+            return QRect(rect.right() - m - w, rect.center().y() - h // 2, w, h)
+        h = self.GRID_BUTTON_HEIGHT
+        return QRect(rect.left() + m, rect.bottom() - m - h, rect.width() - 2 * m, h)
+
+    def sizeHint(self, option, index):
+        if self.list_mode:
+            return QSize(self.thumb_size + 400, 100)
+        return QSize(self.thumb_size + 20, self.thumb_size + 75)
+
+    def paint(self, painter, option, index):
+        item = index.data(Qt.ItemDataRole.UserRole)
+        if not item: return
+        rect = option.rect
+        m = self.MARGIN
+        size = self.thumb_size
+
+        # 背景（QListView::item のスタイル・ホバー・選択状態）だけをスタイルに描かせる
+        panel = QStyleOptionViewItem(option)
+        self.initStyleOption(panel, index)
+        panel.text = ""
+        panel.icon = QIcon()
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, panel, painter, option.widget)
+
+        painter.save()
+        if self.list_mode:
+            thumb_rect = QRect(rect.left() + m, rect.center().y() - size // 2, size, size)
+        else:
+            thumb_rect = QRect(rect.left() + (rect.width() - size) // 2, rect.top() + m, size, size)
+        painter.fillRect(thumb_rect, QColor("#000"))
+        deco = index.data(Qt.ItemDataRole.DecorationRole)
+        if isinstance(deco, QPixmap) and not deco.isNull():
+            pix = deco.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio,
+                              Qt.TransformationMode.SmoothTransformation) \
+                if deco.width() > size or deco.height() > size else deco
+            painter.drawPixmap(thumb_rect.left() + (size - pix.width()) // 2,
+                               thumb_rect.top() + (size - pix.height()) // 2, pix)
+        elif isinstance(deco, QColor):
+            painter.fillRect(thumb_rect, deco)
+
+        btn_rect = self.button_rect(rect)
+        font = painter.font()
+        if self.list_mode:
+            text_rect = QRect(thumb_rect.right() + 15, rect.top() + 10,
+                              btn_rect.left() - thumb_rect.right() - 30, rect.height() - 20)
+            font.setPixelSize(14)
+            font.setBold(True)
+            painter.setFont(font)
+            painter.setPen(QColor("#fff"))
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop, item['name'])
+            font.setPixelSize(11)
+            font.setBold(False)
+            painter.setFont(font)
+            painter.setPen(QColor("#888"))
+            painter.drawText(text_rect.adjusted(0, 22, 0, 0),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop | Qt.TextFlag.TextWrapAnywhere,
+                             item['path'])
+            btn_text = "ゴミ箱へ"
+        else:
+            text_rect = QRect(rect.left() + m, thumb_rect.bottom() + 5, rect.width() - 2 * m, 25)
+            font.setPixelSize(10)
+            painter.setFont(font)
+            painter.setPen(QColor("#ccc"))
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignHCenter | Qt.TextFlag.TextWrapAnywhere, item['name'])
+            btn_text = "削除"
+
+        # 削除ボタン
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#d83b01"))
+        painter.drawRoundedRect(btn_rect, 4, 4)
+        font.setPixelSize(12)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor("white"))
+        painter.drawText(btn_rect, Qt.AlignmentFlag.AlignCenter, btn_text)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() == QEvent.Type.MouseButtonRelease
+                and event.button() == Qt.MouseButton.LeftButton
+                and self.button_rect(option.rect).contains(event.position().toPoint())):
+            self.delete_requested.emit(index.row())
+            return True
+        return super().editorEvent(event, model, option, index)
+
 
 class DuplicatePage(QWidget):
     def __init__(self, db_manager):
@@ -22,6 +135,7 @@ class DuplicatePage(QWidget):
         self.current_group_data = []
         self.thumbnail_size = config.DEFAULT_GRID_THUMBNAIL_SIZE
         self.selected_item_data = None  # 選択中のアイテムデータ
+        self.model = ThumbnailListModel(self.db, thumb_size=self.thumbnail_size)
         self.init_ui()
 
     def init_ui(self):
@@ -93,26 +207,35 @@ class DuplicatePage(QWidget):
         header_layout.addWidget(self.btn_view_grid)
         header_layout.addWidget(self.btn_view_list)
 
-        size_label = QLabel(f"サムネイルサイズ: {self.thumbnail_size}px (Ctrl+ホイールで変更)")
-        size_label.setStyleSheet("color: #888; font-size: 11px;")
-        header_layout.addWidget(size_label)
+        self.size_label = QLabel()
+        self.size_label.setStyleSheet("color: #888; font-size: 11px;")
+        header_layout.addWidget(self.size_label)
         right_layout.addLayout(header_layout)
 
-        # エリア
-        self.container = QWidget()
-        self.grid = QGridLayout(self.container)
-        self.grid.setContentsMargins(0, 0, 0, 0)
-        self.grid.setSpacing(10)
-        self.grid.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-        
-        self.area = QScrollArea()
-        self.area.setWidgetResizable(True)
-        self.area.setStyleSheet("border: none; background-color: transparent;")
-        self.area.setWidget(self.container)
+        # 一覧（表示中の行だけ描画されるQListView。各アイテムはデリゲートが描画）
+        self.view = QListView()
+        self.view.setStyleSheet("""
+            QListView { border: none; background-color: transparent; }
+            QListView::item { background-color: #2d2d30; border: 1px solid #3e3e42; border-radius: 6px; }
+            QListView::item:hover { border-color: #007acc; background-color: #353538; }
+            QListView::item:selected { border-color: #007acc; background-color: #353538; }
+        """)
+        self.delegate = DuplicateItemDelegate(self.view)
+        self.delegate.delete_requested.connect(self.trash_row)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setUniformItemSizes(True)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setMovement(QListView.Movement.Static)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.view.setMouseTracking(True)
+        self.view.setModel(self.model)
+        self.view.selectionModel().currentChanged.connect(
+            lambda cur, _prev: self.on_item_clicked(cur.data(Qt.ItemDataRole.UserRole)))
         # ホイールイベントをインストール
-        self.area.wheelEvent = self.on_wheel_event
-        
-        right_layout.addWidget(self.area)
+        self.view.wheelEvent = self.on_wheel_event
+        self.apply_view_mode()
+
+        right_layout.addWidget(self.view)
 
         
         # 右側: プレビューパネル
@@ -151,7 +274,8 @@ class DuplicatePage(QWidget):
 
     def load_data(self):
         self.list.clear()
-        self.clear_grid()
+        self.current_group_data = []
+        self.model.clear()
         try:
             hashes = self.db.get_duplicate_hashes()
             if not hashes:
@@ -171,9 +295,14 @@ class DuplicatePage(QWidget):
         try:
             # データ取得
             files = self.db.get_files_by_hash(h)
+            # サムネイルはグループ分を1回のクエリでまとめて取得しておく
+            blobs = self.db.get_thumbnails([f[0] for f in files])
             # 辞書形式に変換して保持
-            self.current_group_data = [{'id': f[0], 'path': f[1], 'size': f[2], 'mtime': f[3]} for f in files]
-            self.render_items()
+            self.current_group_data = [{'id': f[0], 'path': f[1], 'size': f[2], 'mtime': f[3],
+                                        'name': os.path.basename(f[1]), 'thumb': None,
+                                        'thumb_blob': blobs.get(f[0])} for f in files]
+            self.model.clear()
+            self.model.extend(self.current_group_data)
         except Exception as e:
             logger.error(f"Failed to load duplicate group: {e}", exc_info=True)
             from PyQt6.QtWidgets import QMessageBox
@@ -181,69 +310,31 @@ class DuplicatePage(QWidget):
 
     def toggle_view(self, btn):
         self.view_mode = "grid" if btn == self.btn_view_grid else "list"
-        if self.current_group_data:
-            self.render_items()
-    
-    def render_items(self):
-        self.clear_grid()
-        if self.view_mode == "grid":
-            self.render_grid_view()
+        self.apply_view_mode()
+
+    def apply_view_mode(self):
+        """表示モード・サムネイルサイズに合わせてQListViewの配置を切り替え（モデルはそのまま）"""
+        grid = self.view_mode == "grid"
+        size = self.thumbnail_size if grid else LIST_THUMBNAIL_SIZE
+        self.delegate.list_mode = not grid
+        self.delegate.thumb_size = size
+        if grid:
+            self.view.setViewMode(QListView.ViewMode.IconMode)
+            self.view.setFlow(QListView.Flow.LeftToRight)
+            self.view.setWrapping(True)
+            self.view.setGridSize(QSize(size + 30, size + 85))
+            self.view.setSpacing(0)
         else:
-            self.render_list_view()
-        # サイズラベルを更新
-        size_label = self.findChild(QLabel)
-        if size_label and "サムネイルサイズ" in size_label.text():
-            size_label.setText(f"サムネイルサイズ: {self.thumbnail_size}px (Ctrl+ホイールで変更)")
-
-    def render_grid_view(self):
-        # 列数をサムネイルサイズに応じて調整
-        cols = max(3, int(800 / (self.thumbnail_size + 20)))  # 余白を考慮
-        thumb_size = self.thumbnail_size
-        frame_width = thumb_size + 20
-        frame_height = thumb_size + 60
-
-        for i, data in enumerate(self.current_group_data):
-            f = QFrame()
-            f.setFixedSize(frame_width, frame_height)
-            f.setStyleSheet("""
-                QFrame { background-color: #2d2d30; border: 1px solid #3e3e42; border-radius: 6px; }
-                QFrame:hover { border-color: #007acc; background-color: #353538; }
-            """)
-            
-            # クリックイベントを追加（ラムダのクロージャ問題を回避）
-            def make_click_handler(d):
-                return lambda event: self.on_item_clicked(d)
-            f.mousePressEvent = make_click_handler(data)
-
-            l = QVBoxLayout(f)
-            l.setContentsMargins(8, 8, 8, 8)
-            l.setSpacing(5)
-
-            lbl = QLabel()
-            pix = get_db_thumbnail(self.db, data['id'], data['path'], thumb_size)
-            lbl.setPixmap(pix)
-            lbl.setScaledContents(True)
-            lbl.setFixedSize(thumb_size, thumb_size)
-            lbl.setStyleSheet("border: none; border-radius: 4px; background: #000;")
-
-            name_lbl = QLabel(os.path.basename(data['path']))
-            name_lbl.setStyleSheet("border: none; font-size: 10px; color: #ccc;")
-            name_lbl.setWordWrap(True)
-            name_lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            name_lbl.setFixedHeight(25)
-
-            btn = QPushButton("削除")
-            btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            btn.setFixedHeight(22)
-            btn.setStyleSheet(self.get_del_btn_style())
-            btn.clicked.connect(lambda _, fid=data['id'], w=f: self.trash(fid, w))
+            self.view.setViewMode(QListView.ViewMode.ListMode)
+            self.view.setFlow(QListView.Flow.TopToBottom)
+            self.view.setWrapping(False)
+            self.view.setGridSize(QSize())
+            self.view.setSpacing(5)
+        self.view.setIconSize(QSize(size, size))
+        self.model.set_thumb_size(size)
+        self.view.doItemsLayout()
+        self.size_label.setText(f"サムネイルサイズ: {self.thumbnail_size}px (Ctrl+ホイールで変更)")
 
-            l.addWidget(lbl, alignment=Qt.AlignmentFlag.AlignCenter)
-            l.addWidget(name_lbl)
-            l.addWidget(btn)
-
-            self.grid.addWidget(f, i // cols, i % cols)
-    
     def on_item_clicked(self, data):
         """アイテムがクリックされたときの処理"""
         self.selected_item_data = data
@@ -258,7 +349,7 @@ class DuplicatePage(QWidget):
             return
         
         # プレビュー画像を表示
-        pix = get_db_thumbnail(self.db, data['id'], data['path'], 300)
+        pix = get_db_thumbnail(self.db, data['id'], data['path'], 300, data.get('thumb_blob'))
         self.preview_image.setPixmap(pix)
         
         # ファイル情報を取得して表示
@@ -293,76 +384,23 @@ class DuplicatePage(QWidget):
             
             if new_size != self.thumbnail_size:
                 self.thumbnail_size = new_size
-                if self.view_mode == "grid" and self.current_group_data:
-                    self.render_items()
+                self.apply_view_mode()
         else:
             # 通常のスクロール
-            QScrollArea.wheelEvent(self.area, event)
-
-    def render_list_view(self):
-        thumb_size = 80
-        for i, data in enumerate(self.current_group_data):
-            f = QFrame()
-            f.setFixedHeight(100)
-            f.setStyleSheet("""
-                QFrame { background-color: #2d2d30; border: 1px solid #3e3e42; border-radius: 6px; }
-                QFrame:hover { border-color: #007acc; background-color: #353538; }
-            """)
-
-            l = QHBoxLayout(f)
-            l.setContentsMargins(10, 10, 10, 10)
-            l.setSpacing(15)
-
-            lbl = QLabel()
-            pix = get_db_thumbnail(self.db, data['id'], data['path'], thumb_size)
-            lbl.setPixmap(pix)
-            lbl.setScaledContents(True)
-            lbl.setFixedSize(thumb_size, thumb_size)
-            lbl.setStyleSheet("border: none; border-radius: 4px; background: #000;")
-
-            info_layout = QVBoxLayout()
-            name_lbl = QLabel(os.path.basename(data['path']))
-            name_lbl.setStyleSheet("border: none; font-size: 14px; font-weight: bold; color: #fff;")
-            path_lbl = QLabel(data['path'])
-            path_lbl.setStyleSheet("border: none; font-size: 11px; color: #888;")
-            path_lbl.setWordWrap(True)
-
-            info_layout.addWidget(name_lbl)
-            info_layout.addWidget(path_lbl)
-            info_layout.addStretch()
-
-            btn = QPushButton("ゴミ箱へ")
-            btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            btn.setFixedSize(80, 30)
-            btn.setStyleSheet(self.get_del_btn_style())
-            btn.clicked.connect(lambda _, fid=data['id'], w=f: self.trash(fid, w))
-
-            l.addWidget(lbl)
-            l.addLayout(info_layout, stretch=1)
-            l.addWidget(btn)
-
-            self.grid.addWidget(f, i, 0)
-
-    def get_del_btn_style(self):
-        return """
-            QPushButton { background-color: #d83b01; color: white; border: none; border-radius: 4px; font-weight: bold; }
-            QPushButton:hover { background-color: #ff5522; }
-            QPushButton:pressed { background-color: #b33000; }
-        """
-
-    def trash(self, fid, widget):
-        if self.db.move_to_trash(fid):
-            widget.hide()
+            QListView.wheelEvent(self.view, event)
+
+    def trash_row(self, row):
+        """削除ボタンが押された行をゴミ箱へ移動し、一覧から外す"""
+        item = self.model.items[row]
+        if self.db.move_to_trash(item['id']):
+            self.model.remove_rows(row, row)
+            if self.selected_item_data is item:
+                self.selected_item_data = None
+                self.update_preview(None)
         else:
             from PyQt6.QtWidgets import QMessageBox
             QMessageBox.warning(self, "削除失敗", "ファイルの削除に失敗しました。\nログを確認してください。")
 
-    def clear_grid(self):
-        while self.grid.count():
-            item = self.grid.takeAt(0)
-            if item.widget(): item.widget().deleteLater()
-
-
 if __name__ == "__main__":
     setup_logging()
     app = QApplication(sys.argv)